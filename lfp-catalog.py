@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Index LFP files into an SQLite catalog and query it
+"""
+
+
+from __future__ import print_function
+
+import os.path
+import sys
+import argparse
+
+from lfp_reader import lfp_logging
+from lfp_reader.lfp_catalog import LfpCatalog
+lfp_logging.set_log_stream(sys.stdout)
+
+
+DEBUG = False
+QUIET = False
+
+
+def index(catalog, paths, jobs, **null):
+    """Index LFP files and directories, skipping unchanged files
+    """
+    lfp_catalog = LfpCatalog(catalog)
+    try:
+        changed, removed = lfp_catalog.index(paths, jobs=jobs)
+    finally:
+        lfp_catalog.close()
+    if not QUIET:
+        print("Indexed files: %d, removed files: %d" % (changed, removed))
+
+
+def query(catalog, file_type, stack_types, fields, chunk_sha1, **null):
+    """List indexed LFP files matching all the given conditions
+    """
+    try:
+        fields = [ field.split('=', 1) for field in fields ]
+        fields = [ (key, value) for key, value in fields ]
+    except ValueError:
+        raise Exception("Fields shall be given as KEY=PATTERN")
+    lfp_catalog = LfpCatalog(catalog)
+    try:
+        for path in lfp_catalog.query(file_type, stack_types, fields, chunk_sha1):
+            print(path)
+    finally:
+        lfp_catalog.close()
+
+
+def main(argv=sys.argv[1:]):
+    """Parse command-line arguments and call commands
+    """
+    global DEBUG, QUIET
+
+    debug_kwargs = dict(
+            action='store_true',
+            help="Print debugging information on error",
+            )
+    quiet_kwargs = dict(
+            action='store_true',
+            help="Do not write anything to standard output",
+            )
+    catalog_kwargs = dict(
+            metavar='catalog.db',
+            help='SQLite catalog file path',
+            )
+
+    # Main command
+    p_main = argparse.ArgumentParser(description=__doc__)
+    p_subs = p_main.add_subparsers(title='subcommands')
+
+    # Index command
+    p_index = p_subs.add_parser('index', help=index.__doc__)
+    p_index.set_defaults(subcmd=index)
+    p_index.add_argument('-d', '--debug', **debug_kwargs)
+    p_index.add_argument('-q', '--quiet', **quiet_kwargs)
+    p_index.add_argument('-j', '--jobs', type=int, default=None,
+            help="Number of worker processes (default: number of CPUs)")
+    p_index.add_argument('catalog', **catalog_kwargs)
+    p_index.add_argument('paths', nargs='+', metavar='path',
+            help='LFP file or directory path')
+
+    # Query command
+    p_query = p_subs.add_parser('query', help=query.__doc__)
+    p_query.set_defaults(subcmd=query)
+    p_query.add_argument('-d', '--debug', **debug_kwargs)
+    p_query.add_argument('-q', '--quiet', **quiet_kwargs)
+    p_query.add_argument('-t', '--type', dest='file_type',
+            choices=('picture', 'storage'),
+            help="Type of LFP file")
+    p_query.add_argument('-s', '--stack', dest='stack_types', action='append', default=[],
+            choices=('refocus', 'parallax', 'depth_map'),
+            help="Type of stack the LFP Picture file shall have")
+    p_query.add_argument('-f', '--field', dest='fields', action='append', default=[],
+            metavar='KEY=PATTERN',
+            help="Metadata field, matching a glob pattern ('frame.camera.model=F01*')")
+    p_query.add_argument('-c', '--chunk', dest='chunk_sha1',
+            help="SHA1 key of a data chunk the LFP file shall have ('sha1-...')")
+    p_query.add_argument('catalog', **catalog_kwargs)
+
+    # Parse arguments
+    try:
+        args = p_main.parse_args(argv)
+    except SystemExit:
+        print()
+        if 'index' in argv:
+            p_index.print_help()
+        elif 'query' in argv:
+            p_query.print_help()
+        else:
+            p_main.print_help()
+        sys.exit(2)
+
+    # Run subcommand
+    DEBUG = args.debug
+    QUIET = args.quiet
+    if QUIET:
+        lfp_logging.set_log_stream(None)
+    args.subcmd(**dict(args._get_kwargs()))
+
+
+if __name__=='__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(3)
+    except Exception as err:
+        if DEBUG:
+            raise
+        else:
+            if not QUIET:
+                print("%s: error: %s" % (os.path.basename(sys.argv[0]), err), file=sys.stderr)
+            sys.exit(9)
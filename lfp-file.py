@@ -31,7 +31,10 @@ import os.path
 import sys
 import argparse
 
-from lfp_reader import LfpGenericFile, lfp_logging
+from lfp_reader import LfpGenericFile, LfpStreamReader, lfp_logging
+from lfp_reader.lfp_chunk_store import LfpChunkStore
+from lfp_reader.lfp_writer import LfpWriter
+from lfp_reader.lfp_archive import LfpArchiveWriter
 lfp_logging.set_log_stream(sys.stdout)
 
 
@@ -49,14 +52,29 @@ def info(lfp_files, **null):
         LfpGenericFile(lfp_file).load().print_info()
 
 
-def export(lfp_files, **null):
+def export(lfp_files, store_dir=None, link=False, archive=None, archive_format=None, **null):
     """Export LFP file into separate data files
     """
-    for idx, lfp_file in enumerate(lfp_files):
-        if not QUIET:
-            if idx > 0: print()
-            print("LFP file: %s" % lfp_file.name)
-        LfpGenericFile(lfp_file).load().export()
+    out = sys.stderr if archive == '-' else sys.stdout
+    lfp_logging.set_log_stream(out)
+    store = LfpChunkStore(store_dir) if store_dir else None
+    archive_writer = LfpArchiveWriter(archive, archive_format) if archive else None
+    try:
+        for idx, lfp_file in enumerate(lfp_files):
+            if not QUIET:
+                if idx > 0: print(file=out)
+                print("LFP file: %s" % lfp_file.name, file=out)
+            lfp = LfpGenericFile(lfp_file).load()
+            if archive_writer:
+                lfp.export_to_archive(archive_writer)
+            elif store:
+                lfp.export_meta()
+                lfp.export_chunks_to_store(store, link=link)
+            else:
+                lfp.export()
+    finally:
+        if archive_writer:
+            archive_writer.close()
 
 
 def extract(lfp_file, sha1, **null):
@@ -70,6 +88,36 @@ def extract(lfp_file, sha1, **null):
     sys.stdout.write(chunk.data.decode('UTF-8'))
 
 
+def repack(lfp_file, output=None, drop_sha1s=(), drop_frame=False, **null):
+    """Repack LFP file into a new file, dropping some data chunks
+    """
+    lfp = LfpGenericFile(lfp_file).load()
+    drop_sha1s = set(drop_sha1s)
+    if drop_frame:
+        for frame_item in lfp.meta.content.get('picture', {}).get('frameArray', []):
+            drop_sha1s.add(frame_item['frame']['imageRef'])
+    if output is None:
+        output = lfp.get_export_path('repacked', 'lfp')
+    elif output == '-':
+        lfp_logging.set_log_stream(sys.stderr)
+        output = getattr(sys.stdout, 'buffer', sys.stdout)
+    with LfpWriter(output) as writer:
+        writer.copy_file(lfp, drop_sha1s)
+
+
+def verify(lfp_files, **null):
+    """Verify sections of LFP files in one pass (use "-" for standard input)
+    """
+    for idx, lfp_file in enumerate(lfp_files):
+        if not QUIET:
+            if idx > 0: print()
+            print("LFP file: %s" % lfp_file.name)
+        for section in LfpStreamReader(lfp_file):
+            section.skip()
+            if not QUIET:
+                print("\t%-6s %-45s : %d B" % (section.NAME, section.sha1 or '', section.size))
+
+
 def main(argv=sys.argv[1:]):
     """Parse command-line arguments and call commands
     """
@@ -98,6 +146,7 @@ def main(argv=sys.argv[1:]):
     p_info.set_defaults(subcmd=info)
     p_info.add_argument('-d', '--debug', **debug_kwargs)
     p_info.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_info)
     p_info.add_argument('lfp_files', nargs='+', **lfp_file_kwargs)
 
     # Export command
@@ -105,6 +154,15 @@ def main(argv=sys.argv[1:]):
     p_export.set_defaults(subcmd=export)
     p_export.add_argument('-d', '--debug', **debug_kwargs)
     p_export.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_export)
+    p_export.add_argument('-s', '--store', dest='store_dir', metavar='DIR',
+            help="Write data chunks into a content-addressed store, skipping stored ones")
+    p_export.add_argument('-l', '--link', action='store_true',
+            help="With --store, also link stored chunks to the usual export files")
+    p_export.add_argument('-a', '--archive', metavar='FILE',
+            help='Write all exported files into one tar or zip archive ("-" for standard output)')
+    p_export.add_argument('--archive-format', choices=LfpArchiveWriter.FORMATS,
+            help="Archive format (default: zip for .zip files, tar otherwise)")
     p_export.add_argument('lfp_files', nargs='+', **lfp_file_kwargs)
 
     # Extract command
@@ -112,10 +170,34 @@ def main(argv=sys.argv[1:]):
     p_extract.set_defaults(subcmd=extract)
     p_extract.add_argument('-d', '--debug', **debug_kwargs)
     p_extract.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_extract)
     p_extract.add_argument('lfp_file', **lfp_file_kwargs)
     p_extract.add_argument('sha1',
             help="SHA1 key of data chunk ('sha1-...')")
 
+    # Repack command
+    p_repack = p_subs.add_parser('repack', help=repack.__doc__)
+    p_repack.set_defaults(subcmd=repack)
+    p_repack.add_argument('-d', '--debug', **debug_kwargs)
+    p_repack.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_repack)
+    p_repack.add_argument('-o', '--output', metavar='FILE',
+            help='Output LFP file path ("-" for standard output, default: "file__repacked.lfp")')
+    p_repack.add_argument('--drop', dest='drop_sha1s', action='append', default=[],
+            metavar='SHA1',
+            help="SHA1 key of a data chunk to drop ('sha1-...')")
+    p_repack.add_argument('--drop-frame', action='store_true',
+            help="Drop the raw frame image of LFP Picture files")
+    p_repack.add_argument('lfp_file', **lfp_file_kwargs)
+
+    # Verify command
+    p_verify = p_subs.add_parser('verify', help=verify.__doc__)
+    p_verify.set_defaults(subcmd=verify)
+    p_verify.add_argument('-d', '--debug', **debug_kwargs)
+    p_verify.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_verify)
+    p_verify.add_argument('lfp_files', nargs='+', **lfp_file_kwargs)
+
     # Parse arguments
     try:
         args = p_main.parse_args(argv)
@@ -127,6 +209,10 @@ def main(argv=sys.argv[1:]):
             p_export.print_help()
         elif 'extract' in argv:
             p_extract.print_help()
+        elif 'repack' in argv:
+            p_repack.print_help()
+        elif 'verify' in argv:
+            p_verify.print_help()
         else:
             p_main.print_help()
         sys.exit(2)
@@ -134,7 +220,7 @@ def main(argv=sys.argv[1:]):
     # Run subcommand
     DEBUG = args.debug
     QUIET = args.quiet
-    args.subcmd(**dict(args._get_kwargs()))
+    lfp_logging.run_instrumented(args)
 
 
 if __name__=='__main__':
@@ -32,6 +32,8 @@ import sys
 import argparse
 
 from lfp_reader import LfpPictureFile, lfp_logging
+from lfp_reader import lfp_depth, lfp_thumbnails, lfp_animation, lfp_server, lfp_daemon
+from lfp_reader.lfp_archive import LfpArchiveWriter
 lfp_logging.set_log_stream(sys.stdout)
 
 
@@ -46,18 +48,75 @@ def info(lfp_files, **null):
         if not QUIET:
             if idx > 0: print()
             print("LFP Picture file: %s" % lfp_file.name)
-        LfpPictureFile(lfp_file).load().print_info()
+        lfp_daemon.load_picture(lfp_file).print_info(sys.stdout)
 
 
 
-def export(lfp_files, **null):
+def export(lfp_files, archive=None, archive_format=None, depth_formats=None, **null):
     """Export LFP Picture file into separate data files
     """
+    out = sys.stderr if archive == '-' else sys.stdout
+    lfp_logging.set_log_stream(out)
+    archive_writer = LfpArchiveWriter(archive, archive_format) if archive else None
+    try:
+        for idx, lfp_file in enumerate(lfp_files):
+            if not QUIET:
+                if idx > 0: print(file=out)
+                print("LFP Picture file: %s" % lfp_file.name, file=out)
+            lfp = lfp_daemon.load_picture(lfp_file)
+            if archive_writer:
+                lfp.export_to_archive(archive_writer, depth_formats=depth_formats or ('txt',))
+            else:
+                lfp.export(depth_formats=depth_formats or ('txt',))
+    finally:
+        if archive_writer:
+            archive_writer.close()
+
+
+
+def thumbnails(lfp_paths, size, output_dir=None, contact_sheet=None,
+        columns=8, rows=8, jobs=None, **null):
+    """Make thumbnails or contact sheets of the default view of LFP Picture files
+    """
+    size = (size, size)
+    if contact_sheet:
+        lfp_thumbnails.write_contact_sheets(lfp_paths, contact_sheet, size,
+                columns=columns, rows=rows, jobs=jobs)
+    else:
+        lfp_thumbnails.write_thumbnails(lfp_paths, size, output_dir, jobs=jobs)
+
+
+
+def animate(lfp_files, mode, image_format, size=None, duration=100,
+        bounce=False, steps=36, **null):
+    """Render a focus sweep or parallax orbit of LFP Picture file as animation
+    """
+    size = (size, size) if size else None
     for idx, lfp_file in enumerate(lfp_files):
         if not QUIET:
             if idx > 0: print()
             print("LFP Picture file: %s" % lfp_file.name)
-        LfpPictureFile(lfp_file).load().export()
+        lfp = lfp_daemon.load_picture(lfp_file)
+        file_path = lfp.get_export_path(mode, image_format)
+        if mode == 'focus_sweep':
+            lfp_animation.write_focus_sweep(lfp, file_path, size, duration, bounce)
+        else:
+            lfp_animation.write_parallax_orbit(lfp, file_path, size, duration, steps)
+
+
+
+def serve(lfp_paths, host, port, threads, **null):
+    """Serve images, depth and metadata of LFP Picture files over HTTP
+    """
+    lfp_server.serve(lfp_paths, (host, port), threads)
+
+
+
+def daemon(socket_path=None, cache_budget=None, **null):
+    """Run commands forwarded by this script, keeping LFP Picture files open
+    """
+    lfp_daemon.serve(run, socket_path,
+            cache_budget * 2**20 if cache_budget else lfp_daemon.DEFAULT_CACHE_BUDGET)
 
 
 
@@ -89,6 +148,7 @@ def main(argv=sys.argv[1:]):
     p_info.set_defaults(subcmd=info)
     p_info.add_argument('-d', '--debug', **debug_kwargs)
     p_info.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_info)
     p_info.add_argument('lfp_files', nargs='+', **lfp_file_kwargs)
 
     # Export command
@@ -96,8 +156,87 @@ def main(argv=sys.argv[1:]):
     p_export.set_defaults(subcmd=export)
     p_export.add_argument('-d', '--debug', **debug_kwargs)
     p_export.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_export)
+    p_export.add_argument('-a', '--archive', metavar='FILE',
+            help='Write all exported files into one tar or zip archive ("-" for standard output)')
+    p_export.add_argument('--archive-format', choices=LfpArchiveWriter.FORMATS,
+            help="Archive format (default: zip for .zip files, tar otherwise)")
+    p_export.add_argument('--depth-format', dest='depth_formats', action='append',
+            choices=lfp_depth.DEPTH_FORMATS,
+            help="Format of the exported depth look-up table, can be repeated (default: txt)")
     p_export.add_argument('lfp_files', nargs='+', **lfp_file_kwargs)
 
+    # Thumbnails command
+    p_thumbnails = p_subs.add_parser('thumbnails', help=thumbnails.__doc__)
+    p_thumbnails.set_defaults(subcmd=thumbnails)
+    p_thumbnails.add_argument('-d', '--debug', **debug_kwargs)
+    p_thumbnails.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_thumbnails)
+    p_thumbnails.add_argument('-s', '--size', type=int, default=256,
+            help="Maximum width and height of thumbnails (default: 256)")
+    p_thumbnails.add_argument('-o', '--output-dir', metavar='DIR',
+            help="Write thumbnails into this directory (default: next to LFP files)")
+    p_thumbnails.add_argument('-c', '--contact-sheet', metavar='PREFIX',
+            help='Tile thumbnails into contact sheets "PREFIX_001.jpeg", ...')
+    p_thumbnails.add_argument('--columns', type=int, default=8,
+            help="Number of columns of contact sheets (default: 8)")
+    p_thumbnails.add_argument('--rows', type=int, default=8,
+            help="Number of rows of contact sheets (default: 8)")
+    p_thumbnails.add_argument('-j', '--jobs', type=int,
+            help="Number of worker processes (default: number of CPUs)")
+    p_thumbnails.add_argument('lfp_paths', nargs='+', metavar='picture.lfp',
+            help="LFP Picture file or directory path")
+
+    # Animate command
+    p_animate = p_subs.add_parser('animate', help=animate.__doc__)
+    p_animate.set_defaults(subcmd=animate)
+    p_animate.add_argument('-d', '--debug', **debug_kwargs)
+    p_animate.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_animate)
+    p_animate.add_argument('-m', '--mode', choices=lfp_animation.ANIMATION_MODES,
+            default='focus_sweep',
+            help="Images of the animation (default: focus_sweep)")
+    p_animate.add_argument('-f', '--format', dest='image_format',
+            choices=lfp_animation.ANIMATION_FORMATS, default='gif',
+            help="Animation format, all but gif are encoded by ffmpeg (default: gif)")
+    p_animate.add_argument('-s', '--size', type=int,
+            help="Maximum width and height of frames (default: image size)")
+    p_animate.add_argument('--duration', type=int, default=100,
+            help="Display time of each frame, in milliseconds (default: 100)")
+    p_animate.add_argument('--bounce', action='store_true',
+            help="Sweep the focus back to its start")
+    p_animate.add_argument('--steps', type=int, default=36,
+            help="Number of points of the parallax orbit (default: 36)")
+    p_animate.add_argument('lfp_files', nargs='+', **lfp_file_kwargs)
+
+    # Serve command
+    p_serve = p_subs.add_parser('serve', help=serve.__doc__)
+    p_serve.set_defaults(subcmd=serve)
+    p_serve.add_argument('-d', '--debug', **debug_kwargs)
+    p_serve.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_serve)
+    p_serve.add_argument('--host', default=lfp_server.DEFAULT_ADDRESS[0],
+            help="Address to listen on (default: %s, local only)" % lfp_server.DEFAULT_ADDRESS[0])
+    p_serve.add_argument('-p', '--port', type=int, default=lfp_server.DEFAULT_ADDRESS[1],
+            help="Port to listen on (default: %d)" % lfp_server.DEFAULT_ADDRESS[1])
+    p_serve.add_argument('-t', '--threads', type=int, default=lfp_server.DEFAULT_THREADS,
+            help="Number of request handling threads (default: %d)" % lfp_server.DEFAULT_THREADS)
+    p_serve.add_argument('lfp_paths', nargs='+', metavar='picture.lfp',
+            help="LFP Picture file or directory path")
+
+    # Daemon command
+    p_daemon = p_subs.add_parser('daemon', help=daemon.__doc__)
+    p_daemon.set_defaults(subcmd=daemon)
+    p_daemon.add_argument('-d', '--debug', **debug_kwargs)
+    p_daemon.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_daemon)
+    p_daemon.add_argument('-s', '--socket', dest='socket_path', metavar='PATH',
+            help="UNIX socket path (default: $%s, or lfp-reader-<uid>/daemon.sock in temporary directory)"
+            % lfp_daemon.SOCKET_PATH_ENV)
+    p_daemon.add_argument('--cache-budget', type=int, metavar='MB',
+            help="Memory for open pictures and their decoded images (default: %d)"
+            % (lfp_daemon.DEFAULT_CACHE_BUDGET // 2**20))
+
     # Parse arguments
     try:
         args = p_main.parse_args(argv)
@@ -107,6 +246,14 @@ def main(argv=sys.argv[1:]):
             p_info.print_help()
         elif 'export' in argv:
             p_export.print_help()
+        elif 'thumbnails' in argv:
+            p_thumbnails.print_help()
+        elif 'animate' in argv:
+            p_animate.print_help()
+        elif 'serve' in argv:
+            p_serve.print_help()
+        elif 'daemon' in argv:
+            p_daemon.print_help()
         else:
             p_main.print_help()
         sys.exit(2)
@@ -114,19 +261,30 @@ def main(argv=sys.argv[1:]):
     # Run subcommand
     DEBUG = args.debug
     QUIET = args.quiet
-    args.subcmd(**dict(args._get_kwargs()))
+    lfp_logging.run_instrumented(args)
 
 
-if __name__=='__main__':
+def run(argv=sys.argv[1:]):
+    """Run a command, return its exit status
+    """
     try:
-        main()
+        main(argv)
     except KeyboardInterrupt:
-        sys.exit(3)
+        return 3
     except Exception as err:
         if DEBUG:
             raise
         else:
             if not QUIET:
                 print("%s: error: %s" % (os.path.basename(sys.argv[0]), err), file=sys.stderr)
-            sys.exit(9)
+            return 9
+    return 0
+
+
+if __name__=='__main__':
+    status = None
+    if sys.argv[1:2] not in (['serve'], ['daemon']):
+        # Run in the daemon, when it is running
+        status = lfp_daemon.forward_command(sys.argv[1:])
+    sys.exit(run() if status is None else status)
 
@@ -32,6 +32,7 @@ import sys
 import argparse
 
 from lfp_reader import LfpStorageFile, lfp_logging
+from lfp_reader.lfp_archive import LfpArchiveWriter
 lfp_logging.set_log_stream(sys.stdout)
 
 
@@ -50,14 +51,25 @@ def info(lfp_files, **null):
 
 
 
-def export(lfp_files, **null):
+def export(lfp_files, patterns=None, archive=None, archive_format=None, **null):
     """Export LFP Storage file into separate data files
     """
-    for idx, lfp_file in enumerate(lfp_files):
-        if not QUIET:
-            if idx > 0: print()
-            print("LFP Storage file: %s" % lfp_file.name)
-        LfpStorageFile(lfp_file).load().export()
+    out = sys.stderr if archive == '-' else sys.stdout
+    lfp_logging.set_log_stream(out)
+    archive_writer = LfpArchiveWriter(archive, archive_format) if archive else None
+    try:
+        for idx, lfp_file in enumerate(lfp_files):
+            if not QUIET:
+                if idx > 0: print(file=out)
+                print("LFP Storage file: %s" % lfp_file.name, file=out)
+            lfp = LfpStorageFile(lfp_file).load()
+            if archive_writer:
+                lfp.export_to_archive(archive_writer)
+            else:
+                lfp.export_files(patterns or ('*',))
+    finally:
+        if archive_writer:
+            archive_writer.close()
 
 
 def extract(lfp_file, emb_path, **null):
@@ -99,6 +111,7 @@ def main(argv=sys.argv[1:]):
     p_info.set_defaults(subcmd=info)
     p_info.add_argument('-d', '--debug', **debug_kwargs)
     p_info.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_info)
     p_info.add_argument('lfp_files', nargs='+', **lfp_file_kwargs)
 
     # Export command
@@ -106,6 +119,14 @@ def main(argv=sys.argv[1:]):
     p_export.set_defaults(subcmd=export)
     p_export.add_argument('-d', '--debug', **debug_kwargs)
     p_export.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_export)
+    p_export.add_argument('-p', '--pattern', dest='patterns', action='append',
+            metavar='PATTERN',
+            help=r"Only export embedded files matching a glob pattern ('C:\CALIB\*')")
+    p_export.add_argument('-a', '--archive', metavar='FILE',
+            help='Write all exported files into one tar or zip archive ("-" for standard output)')
+    p_export.add_argument('--archive-format', choices=LfpArchiveWriter.FORMATS,
+            help="Archive format (default: zip for .zip files, tar otherwise)")
     p_export.add_argument('lfp_files', nargs='+', **lfp_file_kwargs)
 
     # Extract command
@@ -113,6 +134,7 @@ def main(argv=sys.argv[1:]):
     p_extract.set_defaults(subcmd=extract)
     p_extract.add_argument('-d', '--debug', **debug_kwargs)
     p_extract.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_extract)
     p_extract.add_argument('lfp_file', **lfp_file_kwargs)
     p_extract.add_argument('emb_path',
             help=r"Path to embedded data file ('C:\...')")
@@ -135,7 +157,7 @@ def main(argv=sys.argv[1:]):
     # Run subcommand
     DEBUG = args.debug
     QUIET = args.quiet
-    args.subcmd(**dict(args._get_kwargs()))
+    lfp_logging.run_instrumented(args)
 
 
 if __name__=='__main__':
@@ -40,7 +40,7 @@ DEBUG = False
 QUIET = False
 
 
-def view(file_dir_paths, **null):
+def view(file_dir_paths, cache_budget=None, **null):
     """Create a viewer window and show files
     """
     lfp_paths = []
@@ -51,7 +51,8 @@ def view(file_dir_paths, **null):
                     and os.path.join(x, y).lower().endswith('-stk.lfp'))
         else:
             lfp_paths.append(x)
-    viewer = TkLfpViewer(lfp_paths)
+    viewer = TkLfpViewer(lfp_paths,
+            cache_budget=cache_budget * 2**20 if cache_budget else None)
     viewer.mainloop()
 
 
@@ -78,6 +79,10 @@ def main(argv=sys.argv[1:]):
     p_main.set_defaults(subcmd=view)
     p_main.add_argument('-d', '--debug', **debug_kwargs)
     p_main.add_argument('-q', '--quiet', **quiet_kwargs)
+    lfp_logging.add_instrument_arguments(p_main)
+    p_main.add_argument('--cache-budget', type=int, metavar='MB',
+            help="Memory for open pictures, before closing the least recently shown ones (default: %d)"
+            % (TkLfpViewer.PICTURE_CACHE_BUDGET // 2**20))
     p_main.add_argument('file_dir_paths', nargs='+', **lfp_file_kwargs)
 
     # Parse arguments
@@ -96,7 +101,7 @@ def main(argv=sys.argv[1:]):
     # Run subcommand
     DEBUG = args.debug
     QUIET = args.quiet
-    args.subcmd(**dict(args._get_kwargs()))
+    lfp_logging.run_instrumented(args)
 
 
 if __name__=='__main__':
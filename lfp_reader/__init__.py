@@ -56,6 +56,8 @@ The main classes in the ``lfp_reader`` package are:
 - ``LfpGenericFile``
 - ``LfpPictureFile``
 - ``LfpStorageFile``
+- ``LfpStreamReader``
+- ``LfpWriter``
 
 
 Legal Notice
@@ -81,6 +83,8 @@ from __future__ import division, print_function
 from .lfp_file      import LfpGenericFile, LfpGenericError
 from .lfp_picture   import LfpPictureFile, LfpPictureError
 from .lfp_storage   import LfpStorageFile, LfpStorageError
+from .lfp_stream    import LfpStreamReader
+from .lfp_writer    import LfpWriter
 
 
 __version__     = "2.0"
@@ -26,6 +26,9 @@
 
 
 import sys
+import os, os.path
+import threading
+from collections import OrderedDict
 
 
 ################################
@@ -37,13 +40,79 @@ def dict_items(d):
         return d.items()
 
 
+################################
+# Caches
+class LruCache(object):
+    """Thread-safe mapping keeping the `max_size' last used items
+
+    Function `on_evict', if any, is called with the key and value of each
+    item dropped to keep the size.
+    """
+
+    def __init__(self, max_size, on_evict=None):
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            value = self._items.pop(key)
+            self._items[key] = value
+            return value
+
+    def put(self, key, value):
+        evicted = []
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.max_size:
+                evicted.append(self._items.popitem(last=False))
+        if self.on_evict:
+            for item in evicted:
+                self.on_evict(*item)
+
+    def values(self):
+        with self._lock:
+            return list(self._items.values())
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+################################
+# Files
+def find_lfp_paths(paths):
+    """Yield LFP file paths, looking into directories"""
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    if file_name.lower().endswith('.lfp'):
+                        yield os.path.join(dir_path, file_name)
+        else:
+            yield path
+
+
 ################################
 # Standard Library
 if sys.hexversion < 0x03000000:
     from cStringIO import StringIO
+    # Byte buffers
+    BytesIO = StringIO
     import Tkinter as tk, tkFileDialog
 else:
-    from io import StringIO
+    from io import StringIO, BytesIO
     import tkinter as tk
     from tkinter import filedialog as tkFileDialog
 
@@ -55,6 +124,9 @@ try:
 except ImportError:
     pil = None
 
+# High-quality downscaling filter, named ANTIALIAS before Pillow 2.7
+pil_antialias = getattr(pil, 'LANCZOS', None) or getattr(pil, 'ANTIALIAS', None)
+
 try:
     from PIL import ImageTk as piltk
 except ImportError:
@@ -0,0 +1,211 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Render focus sweeps and parallax orbits of LFP Picture files as animations
+
+Frames are decoded one at a time, without caching, and streamed into the
+encoder, so memory does not grow with the number or size of frames.  GIF
+files are written with PIL, using the palette of the first frame for all
+frames (streamed when PIL still provides its GIF writing helpers).  Other
+formats are encoded by an `ffmpeg' process, fed with raw RGB
+frames through a pipe.
+"""
+
+
+from __future__ import division, print_function
+
+import os.path
+import math
+import subprocess
+
+from .lfp_logging import log, span
+from ._utils import pil, check_pil_module
+
+
+ANIMATION_MODES = ('focus_sweep', 'parallax_orbit')
+
+ANIMATION_FORMATS = ('gif', 'webp', 'mp4', 'webm')
+
+FFMPEG = 'ffmpeg'
+
+# Output options of ffmpeg, per file extension
+FFMPEG_OUTPUT_ARGS = {
+        'webp': ['-loop', '0'],
+        # Most H.264 players only support 4:2:0 chroma, with even sizes
+        'mp4':  ['-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2'],
+        }
+
+
+class LfpAnimationError(Exception):
+    """Animation rendering error"""
+
+
+################################################################
+# Frames
+
+def get_focus_sweep_ids(lfp, bounce=False):
+    """Return ids of refocus images, from the nearest to the farthest focus
+
+    With `bounce', the sweep comes back to its start.
+    """
+    refocus_images = lfp.get_refocus_stack().refocus_images
+    image_ids = sorted(refocus_images, key=lambda id: refocus_images[id].lambda_)
+    if bounce:
+        image_ids += image_ids[-2:0:-1]
+    return image_ids
+
+
+def get_parallax_orbit_ids(lfp, steps=36, radius=1.):
+    """Return ids of parallax images closest to `steps' points of an ellipse
+    around the center of the viewpoint, skipping repeated images
+
+    Parameter `radius' is relative to the size of the viewpoint.
+    """
+    image_ids = []
+    for step in range(steps):
+        angle = 2 * math.pi * step / steps
+        pimg = lfp.find_closest_parallax_image(
+                .5 + radius * .5 * math.cos(angle),
+                .5 + radius * .5 * math.sin(angle))
+        if not image_ids or image_ids[-1] != pimg.id:
+            image_ids.append(pimg.id)
+    while len(image_ids) > 1 and image_ids[-1] == image_ids[0]:
+        image_ids.pop()
+    return image_ids
+
+
+def iter_frames(lfp, group, image_ids, size=None):
+    """Yield pil.Image of each image id, decoded when requested"""
+    for image_id in image_ids:
+        yield lfp.decode_pil_image(group, image_id, size)
+
+
+################################################################
+# Writers
+
+def write_gif(file_, frames, duration=100, loop=0):
+    """Write frames into a binary file object as an animated GIF"""
+    check_pil_module()
+    from PIL import GifImagePlugin
+    getheader = getattr(GifImagePlugin, 'getheader', None)
+    getdata = getattr(GifImagePlugin, 'getdata', None)
+    if getheader is None or getdata is None:
+        return _save_gif(file_, frames, duration, loop)
+    palette_image = None
+    for frame in frames:
+        if palette_image is None:
+            palette_image = frame.convert('RGB').convert('P', palette=pil.ADAPTIVE)
+            frame = palette_image
+            header, used_palette = getheader(
+                    palette_image, info=dict(loop=loop, duration=duration))
+            for data in header:
+                file_.write(data)
+        else:
+            frame = frame.convert('RGB').quantize(palette=palette_image)
+        for data in getdata(frame, duration=duration):
+            file_.write(data)
+    if palette_image is None:
+        raise LfpAnimationError("No frames to write")
+    file_.write(b';')
+
+
+def _save_gif(file_, frames, duration, loop):
+    # PIL keeps all frames in memory until the file is written
+    frames = iter(frames)
+    try:
+        palette_image = next(frames).convert('RGB').convert('P', palette=pil.ADAPTIVE)
+    except StopIteration:
+        raise LfpAnimationError("No frames to write")
+    palette_image.save(file_, 'GIF', save_all=True, duration=duration, loop=loop,
+            append_images=( frame.convert('RGB').quantize(palette=palette_image)
+                for frame in frames ))
+
+
+def write_ffmpeg(file_path, frames, duration=100, output_args=None):
+    """Encode frames into a file with ffmpeg, fed through a pipe
+
+    Default `output_args' are taken from FFMPEG_OUTPUT_ARGS, by extension.
+    """
+    if output_args is None:
+        output_args = FFMPEG_OUTPUT_ARGS.get(os.path.splitext(file_path)[1][1:].lower(), [])
+    process = None
+    try:
+        for frame in frames:
+            if frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            if process is None:
+                process = _start_ffmpeg(file_path, frame.size, duration, output_args)
+            tobytes = getattr(frame, 'tobytes', None) or frame.tostring
+            process.stdin.write(tobytes())
+    finally:
+        if process is not None:
+            process.stdin.close()
+            returncode = process.wait()
+    if process is None:
+        raise LfpAnimationError("No frames to write")
+    if returncode != 0:
+        raise LfpAnimationError("ffmpeg failed with exit status %d: %s" % (returncode, file_path))
+
+
+def _start_ffmpeg(file_path, size, duration, output_args):
+    args = [ FFMPEG, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '%dx%d' % size,
+            '-framerate', '%g' % (1000 / duration), '-i', '-' ]
+    try:
+        process = subprocess.Popen(args + list(output_args) + [file_path],
+                stdin=subprocess.PIPE)
+    except OSError:
+        raise LfpAnimationError("Cannot find ffmpeg executable")
+    log("Create file: %s" % file_path)
+    return process
+
+
+def write_animation(file_path, frames, duration=100):
+    """Write frames into an animation file, in the format of its extension
+
+    Parameter `duration' is the display time of each frame, in milliseconds.
+    """
+    with span('write_animation', target=os.path.basename(file_path)):
+        if file_path.lower().endswith('.gif'):
+            with open(file_path, 'wb') as gif_file:
+                log("Create file: %s" % file_path)
+                write_gif(gif_file, frames, duration)
+        else:
+            write_ffmpeg(file_path, frames, duration)
+
+
+################################################################
+# Animations
+
+def write_focus_sweep(lfp, file_path, size=None, duration=100, bounce=False):
+    """Write refocus images of an LFP Picture file as an animation"""
+    image_ids = get_focus_sweep_ids(lfp, bounce)
+    write_animation(file_path, iter_frames(lfp, 'refocus', image_ids, size), duration)
+
+
+def write_parallax_orbit(lfp, file_path, size=None, duration=100, steps=36):
+    """Write parallax images of an LFP Picture file, around the viewpoint,
+    as an animation
+    """
+    image_ids = get_parallax_orbit_ids(lfp, steps)
+    write_animation(file_path, iter_frames(lfp, 'parallax', image_ids, size), duration)
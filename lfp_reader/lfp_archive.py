@@ -0,0 +1,147 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Write exported LFP data into a single tar or zip archive stream
+
+Archives are written sequentially, so they can go to non-seekable outputs
+like standard output or a pipe, and section data is copied in blocks straight
+from the source LFP file.
+"""
+
+
+from __future__ import division, print_function
+
+import sys
+import time
+import tarfile
+import zipfile
+
+from .lfp_logging import log
+from ._utils import BytesIO
+
+
+class LfpArchiveError(Exception):
+    """LFP archive error"""
+
+
+class _SectionReader:
+    """File-like reader over the data blocks of a section"""
+
+    def __init__(self, section):
+        self._blocks = section.iter_data()
+        self._buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._blocks)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class LfpArchiveWriter:
+    """Write files into a tar or zip archive, given a path or a file object
+
+    Path `-' stands for the standard output.
+    """
+
+    FORMATS = ('tar', 'zip')
+
+    def __init__(self, file_, archive_format=None):
+        if archive_format is None:
+            archive_format = 'zip' if str(file_).lower().endswith('.zip') else 'tar'
+        if archive_format not in self.FORMATS:
+            raise LfpArchiveError("Archive format not supported: %s" % archive_format)
+        self._format = archive_format
+
+        self._own_file = False
+        if file_ == '-':
+            file_ = getattr(sys.stdout, 'buffer', sys.stdout)
+        elif isinstance(file_, str):
+            file_ = open(file_, 'wb')
+            self._own_file = True
+        self._file = file_
+
+        if archive_format == 'tar':
+            self._archive = tarfile.open(fileobj=file_, mode='w|')
+        else:
+            self._archive = zipfile.ZipFile(file_, 'w', zipfile.ZIP_STORED, allowZip64=True)
+
+    def __repr__(self):
+        return "LfpArchiveWriter(%s)" % self._format
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._archive is None:
+            return
+        self._archive.close()
+        self._archive = None
+        if self._own_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    ################################
+    # Adding
+
+    def add_data(self, name, data):
+        """Add a member with given bytes"""
+        log("Add to archive: %s" % name)
+        if self._format == 'tar':
+            self._archive.addfile(self._tar_info(name, len(data)), BytesIO(data))
+        else:
+            self._archive.writestr(self._zip_info(name), data)
+
+    def add_section(self, name, section):
+        """Add a member with the data of a section, copied in blocks"""
+        log("Add to archive: %s" % name)
+        if self._format == 'tar':
+            self._archive.addfile(self._tar_info(name, section.size), _SectionReader(section))
+        elif sys.hexversion >= 0x03060000:
+            with self._archive.open(self._zip_info(name), 'w',
+                    force_zip64=section.size >= zipfile.ZIP64_LIMIT) as member:
+                for block in section.iter_data():
+                    member.write(block)
+        else:
+            self._archive.writestr(self._zip_info(name), section.data)
+
+    def _tar_info(self, name, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        return info
+
+    def _zip_info(self, name):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.external_attr = 0o644 << 16
+        return info
@@ -0,0 +1,177 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Access LFP Picture files from asyncio code (Python 3.5+)
+
+File reading and image decoding are moved off the event loop, onto two
+configurable executors:
+
+- the I/O executor opens files and reads their sections;
+- the decode executor processes metadata, H.264 blocks and JPEG images.
+
+A process-wide limit bounds how many of these operations are in flight.
+"""
+
+
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .lfp_picture import LfpPictureFile
+
+
+################################
+# Executors
+
+_io_executor = None
+_decode_executor = None
+_max_concurrency = 16
+_semaphores = weakref.WeakKeyDictionary()
+
+# The GStreamer H.264 splitter shares one main loop, so processing (which may
+# decode H.264 blocks) is serialized.  JPEG decoding runs in parallel.
+_process_lock = threading.Lock()
+
+# Python 3.7+, get_event_loop() returns the running loop in coroutines before
+_get_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+def set_executors(io_executor=None, decode_executor=None):
+    """Set executors used for file I/O and for decoding
+
+    Executors left as `None' are created on demand with default sizes.
+    """
+    global _io_executor, _decode_executor
+    _io_executor = io_executor
+    _decode_executor = decode_executor
+
+
+def set_max_concurrency(max_concurrency):
+    """Set the maximum number of I/O and decode operations in flight"""
+    global _max_concurrency
+    _max_concurrency = max_concurrency
+    _semaphores.clear()
+
+
+def _get_io_executor():
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=8)
+    return _io_executor
+
+
+def _get_decode_executor():
+    global _decode_executor
+    if _decode_executor is None:
+        _decode_executor = ThreadPoolExecutor(max_workers=4)
+    return _decode_executor
+
+
+def _get_semaphore(loop):
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(_max_concurrency)
+    return _semaphores[loop]
+
+
+async def _run(executor, func, *args, **kwargs):
+    loop = _get_running_loop()
+    async with _get_semaphore(loop):
+        return await loop.run_in_executor(executor,
+                functools.partial(func, *args, **kwargs))
+
+
+def _process(lfp):
+    with _process_lock:
+        return lfp.load()
+
+
+def _decode_pil_image(lfp, group, image_id):
+    # pil.open() is lazy, so force decoding here, off the event loop
+    pil_image = lfp.get_pil_image(group, image_id)
+    pil_image.load()
+    return pil_image
+
+
+################################
+# Picture file
+
+class AsyncLfpPictureFile:
+    """Asynchronous facade of `LfpPictureFile'
+
+    Use `await AsyncLfpPictureFile.open(path)' to create instances.  Calls on
+    one picture are serialized, since they share one file object; calls on
+    different pictures run concurrently.
+    """
+
+    def __init__(self, lfp):
+        self._lfp = lfp
+        self._lock = asyncio.Lock()
+
+    def __repr__(self):
+        return "AsyncLfpPictureFile(%s)" % self._lfp.file_path
+
+    @classmethod
+    async def open(cls, file_):
+        lfp = await _run(_get_io_executor(), LfpPictureFile, file_)
+        await _run(_get_io_executor(), lfp.load_sections)
+        await _run(_get_decode_executor(), _process, lfp)
+        return cls(lfp)
+
+    @property
+    def lfp(self):
+        """The underlying `LfpPictureFile', for non-blocking calls"""
+        return self._lfp
+
+    async def close(self):
+        async with self._lock:
+            await _run(_get_io_executor(), self._lfp.close)
+
+    ################################
+    # Images
+
+    async def get_pil_image(self, group, image_id=None):
+        async with self._lock:
+            return await _run(_get_decode_executor(),
+                    _decode_pil_image, self._lfp, group, image_id)
+
+    async def get_refocus_image(self, image_id):
+        return await self.get_pil_image('refocus', image_id)
+
+    async def get_parallax_image(self, image_id):
+        return await self.get_pil_image('parallax', image_id)
+
+    async def get_all_focused_image(self):
+        return await self.get_pil_image('all_focused')
+
+    async def preload_pil_images(self):
+        async with self._lock:
+            await _run(_get_decode_executor(), self._lfp.preload_pil_images)
+
+    ################################
+    # Exporting
+
+    async def export(self, **export_kwargs):
+        async with self._lock:
+            await _run(_get_io_executor(), self._lfp.export, **export_kwargs)
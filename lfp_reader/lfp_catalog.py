@@ -0,0 +1,332 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Index LFP files into an SQLite catalog
+
+Only the metadata of LFP files is read (no image is decoded), and files are
+re-indexed only when their size or modification time change.  The catalog
+tables are:
+
+- files:   path, size, mtime, file_type ('picture' or 'storage') and error
+- fields:  flattened metadata keys and values, i.e. 'frame.camera.model'
+- stacks:  stack_type ('refocus', 'parallax' or 'depth_map') and dimensions
+- lambdas: lambda of each refocus image
+- chunks:  sha1 and size of each data chunk
+"""
+
+
+from __future__ import division, print_function
+
+import os, os.path
+import json
+import sqlite3
+import multiprocessing
+
+from .lfp_logging import log
+from .lfp_file import LfpGenericFile, LfpGenericError
+from ._utils import dict_items, find_lfp_paths
+
+
+class LfpCatalogError(Exception):
+    """LFP catalog error"""
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id          INTEGER PRIMARY KEY,
+    path        TEXT UNIQUE NOT NULL,
+    size        INTEGER,
+    mtime       REAL,
+    file_type   TEXT,
+    error       TEXT);
+CREATE TABLE IF NOT EXISTS fields (
+    file_id     INTEGER NOT NULL,
+    key         TEXT,
+    value       TEXT);
+CREATE TABLE IF NOT EXISTS stacks (
+    file_id     INTEGER NOT NULL,
+    stack_type  TEXT,
+    width       INTEGER,
+    height      INTEGER,
+    image_count INTEGER,
+    representation TEXT,
+    lut_width   INTEGER,
+    lut_height  INTEGER);
+CREATE TABLE IF NOT EXISTS lambdas (
+    file_id     INTEGER NOT NULL,
+    image_id    INTEGER,
+    lambda      REAL);
+CREATE TABLE IF NOT EXISTS chunks (
+    file_id     INTEGER NOT NULL,
+    sha1        TEXT,
+    size        INTEGER);
+CREATE INDEX IF NOT EXISTS fields_key_value ON fields (key, value);
+CREATE INDEX IF NOT EXISTS fields_file_id ON fields (file_id);
+CREATE INDEX IF NOT EXISTS stacks_file_id ON stacks (file_id);
+CREATE INDEX IF NOT EXISTS lambdas_file_id ON lambdas (file_id);
+CREATE INDEX IF NOT EXISTS chunks_file_id ON chunks (file_id);
+CREATE INDEX IF NOT EXISTS chunks_sha1 ON chunks (sha1);
+"""
+
+_STACK_TYPES = {
+        'com.lytro.acceleration.refocusStack': 'refocus',
+        'com.lytro.acceleration.edofParallax': 'parallax',
+        'com.lytro.acceleration.depthMap':     'depth_map',
+        }
+
+
+################################################################
+# Indexing (in worker processes)
+
+def _flatten(prefix, value):
+    """Yield (key, value) pairs of a JSON tree, joining keys with dots"""
+    if isinstance(value, dict):
+        for key, sub_value in dict_items(value):
+            for item in _flatten("%s.%s" % (prefix, key) if prefix else key, sub_value):
+                yield item
+    elif isinstance(value, list):
+        for idx, sub_value in enumerate(value):
+            for item in _flatten("%s.%d" % (prefix, idx), sub_value):
+                yield item
+    elif value is not None:
+        yield prefix, value
+
+
+def _read_stacks(record, picture_data):
+    for accel_data in picture_data.get('accelerationArray') or []:
+        stack_type = _STACK_TYPES.get(accel_data.get('type'))
+        if stack_type is None:
+            continue
+        accel_content = accel_data.get('vendorContent', {})
+        if stack_type == 'depth_map':
+            width  = accel_content.get('width')
+            height = accel_content.get('height')
+        else:
+            dimensions = accel_content['displayParameters']['displayDimensions']['value']
+            width  = dimensions['width']
+            height = dimensions['height']
+
+        if 'imageArray' in accel_content:
+            images = accel_content['imageArray']
+            representation = images[0]['representation'] if images else None
+        elif 'blockOfImages' in accel_content:
+            images = accel_content['blockOfImages']['metadataArray']
+            representation = accel_content['blockOfImages']['representation']
+        else:
+            images = []
+            representation = None
+
+        lut_width = lut_height = None
+        if 'depthLut' in accel_content:
+            lut_width  = accel_content['depthLut']['width']
+            lut_height = accel_content['depthLut']['height']
+
+        record['stacks'].append((stack_type, width, height, len(images),
+            representation, lut_width, lut_height))
+        if stack_type == 'refocus':
+            record['lambdas'].extend((image_id, image['lambda'])
+                    for image_id, image in enumerate(images))
+
+
+def _read_chunk_json(lfp, sha1):
+    try:
+        return json.loads(lfp.chunks[sha1].data.decode('UTF-8'))
+    except (KeyError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def _index_file(path):
+    """Read the catalog record of a LFP file, or None if it was removed"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    record = dict(path=path, size=stat.st_size, mtime=stat.st_mtime,
+            file_type=None, error=None,
+            fields=[], stacks=[], lambdas=[], chunks=[])
+    try:
+        lfp = LfpGenericFile(path).load()
+    except (LfpGenericError, IOError) as err:
+        record['error'] = str(err)
+        return record
+
+    try:
+        content = lfp.meta.content
+        record['chunks'] = [(sha1, chunk.size) for sha1, chunk in lfp.chunks_sorted]
+        record['fields'] = list(_flatten('', content))
+
+        if 'files' in content:
+            record['file_type'] = 'storage'
+        elif 'picture' in content:
+            record['file_type'] = 'picture'
+            picture_data = content['picture']
+            _read_stacks(record, picture_data)
+            # Camera information is kept in the frame metadata chunks
+            for frame_item in picture_data.get('frameArray') or []:
+                frame_data = frame_item.get('frame', {})
+                for ref, prefix in (('metadataRef', 'frame'),
+                                    ('privateMetadataRef', 'frame_private')):
+                    frame_json = _read_chunk_json(lfp, frame_data.get(ref))
+                    if frame_json is not None:
+                        record['fields'].extend(_flatten(prefix, frame_json))
+    except (KeyError, TypeError, IndexError) as err:
+        record['error'] = "Unsupported metadata: %s" % err
+    except (ValueError, UnicodeDecodeError) as err:
+        record['error'] = "Invalid metadata: %s" % err
+    finally:
+        lfp.close()
+    return record
+
+
+################################################################
+# Catalog
+
+class LfpCatalog:
+    """SQLite catalog of LFP files
+    """
+
+    def __init__(self, db_path):
+        self._db_path = db_path
+        self._db = sqlite3.connect(db_path)
+        self._db.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return "LfpCatalog(%s)" % self._db_path
+
+    def close(self):
+        self._db.close()
+
+    ################################
+    # Indexing
+
+    def index(self, paths, jobs=None):
+        """Index LFP files and directories, return numbers of changed and
+        removed files
+
+        Files whose size and modification time are unchanged are skipped, and
+        files removed from the indexed directories are dropped.
+        """
+        known = dict((row[0], (row[1], row[2], row[3])) for row in
+                self._db.execute("SELECT path, id, size, mtime FROM files"))
+        seen = set()
+        changed = []
+        for path in paths:
+            if not os.path.isdir(path) and not os.path.isfile(path):
+                raise LfpCatalogError("Cannot find file or directory: %s" % path)
+        for lfp_path in find_lfp_paths([ os.path.abspath(path) for path in paths ]):
+            try:
+                stat = os.stat(lfp_path)
+            except OSError:
+                # Removed while indexing
+                continue
+            seen.add(lfp_path)
+            if lfp_path in known and known[lfp_path][1:] == (stat.st_size, stat.st_mtime):
+                continue
+            changed.append(lfp_path)
+
+        removed = [ known[path][0] for path in known if path not in seen
+                and self._is_under(path, paths) ]
+        with self._db:
+            for file_id in removed:
+                self._delete_file(file_id)
+
+        if jobs == 1 or len(changed) < 2:
+            records = (_index_file(path) for path in changed)
+            self._store_records(records)
+        else:
+            pool = multiprocessing.Pool(jobs)
+            try:
+                self._store_records(pool.imap_unordered(_index_file, changed, chunksize=8))
+            finally:
+                pool.close()
+                pool.join()
+        return len(changed), len(removed)
+
+    def _is_under(self, path, roots):
+        for root in roots:
+            root = os.path.abspath(root)
+            if path == root or path.startswith(os.path.join(root, '')):
+                return True
+        return False
+
+    def _delete_file(self, file_id):
+        for table in ('fields', 'stacks', 'lambdas', 'chunks'):
+            self._db.execute("DELETE FROM %s WHERE file_id = ?" % table, (file_id,))
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _store_records(self, records):
+        for record in records:
+            if record is None:
+                continue
+            log("Index file: %s" % record['path'])
+            with self._db:
+                row = self._db.execute("SELECT id FROM files WHERE path = ?",
+                        (record['path'],)).fetchone()
+                if row:
+                    self._delete_file(row[0])
+                file_id = self._db.execute(
+                        "INSERT INTO files (path, size, mtime, file_type, error) VALUES (?, ?, ?, ?, ?)",
+                        (record['path'], record['size'], record['mtime'],
+                            record['file_type'], record['error'])).lastrowid
+                self._db.executemany("INSERT INTO fields VALUES (?, ?, ?)",
+                        ((file_id,) + item for item in record['fields']))
+                self._db.executemany("INSERT INTO stacks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        ((file_id,) + item for item in record['stacks']))
+                self._db.executemany("INSERT INTO lambdas VALUES (?, ?, ?)",
+                        ((file_id,) + item for item in record['lambdas']))
+                self._db.executemany("INSERT INTO chunks VALUES (?, ?, ?)",
+                        ((file_id,) + item for item in record['chunks']))
+
+    ################################
+    # Querying
+
+    def query(self, file_type=None, stack_types=(), fields=(), chunk_sha1=None):
+        """Return sorted paths of the indexed files matching all conditions
+
+        Parameter `fields' is a list of (key, value) pairs, where values are
+        matched as glob patterns (i.e. ('frame.camera.model', 'F01*')).
+        """
+        conditions, params = [], []
+        if file_type is not None:
+            conditions.append("file_type = ?")
+            params.append(file_type)
+        for stack_type in stack_types:
+            conditions.append("id IN (SELECT file_id FROM stacks WHERE stack_type = ?)")
+            params.append(stack_type)
+        for key, value in fields:
+            conditions.append("id IN (SELECT file_id FROM fields WHERE key = ? AND value GLOB ?)")
+            params.extend((key, value))
+        if chunk_sha1 is not None:
+            conditions.append("id IN (SELECT file_id FROM chunks WHERE sha1 = ?)")
+            params.append(chunk_sha1)
+        sql = "SELECT path FROM files"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY path"
+        return [ row[0] for row in self._db.execute(sql, params) ]
+
+    def get_fields(self, path):
+        """Return the indexed metadata fields of a file, as a dict"""
+        return dict(self._db.execute(
+            "SELECT key, value FROM fields JOIN files ON files.id = fields.file_id"
+            " WHERE files.path = ?", (os.path.abspath(path),)))
@@ -0,0 +1,152 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Store LFP data chunks by content, sharing them across files
+
+A chunk with id `sha1-abcdef...' is kept at `<store>/ab/cdef...', so chunks
+repeated in many LFP files (calibration data, firmware, ...) are written once.
+"""
+
+
+from __future__ import division, print_function
+
+import os, os.path
+import errno
+import shutil
+import hashlib
+import tempfile
+
+from .lfp_logging import log
+
+
+class LfpChunkStoreError(Exception):
+    """LFP chunk store error"""
+
+
+# Linux ioctl to clone a whole file (FICLONE), for copy-on-write filesystems
+_FICLONE = 0x40049409
+
+
+def _reflink(src_path, dst_path):
+    import fcntl
+    with open(src_path, 'rb') as src_file:
+        with open(dst_path, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+
+
+class LfpChunkStore:
+    """Content-addressed store of LFP data chunks
+    """
+
+    def __init__(self, store_dir):
+        self._store_dir = store_dir
+        if not os.path.isdir(store_dir):
+            os.makedirs(store_dir)
+
+    def __repr__(self):
+        return "LfpChunkStore(%s)" % self._store_dir
+
+    @property
+    def store_dir(self):
+        return self._store_dir
+
+    def get_path(self, sha1):
+        digest = sha1[5:] if sha1.startswith('sha1-') else sha1
+        if len(digest) != 40:
+            raise LfpChunkStoreError("Invalid SHA1 key: %s" % sha1)
+        return os.path.join(self._store_dir, digest[:2], digest[2:])
+
+    def has(self, sha1):
+        return os.path.exists(self.get_path(sha1))
+
+    ################################
+    # Adding
+
+    def add(self, section):
+        """Store the data of a section, unless already present
+
+        Data is copied in blocks and verified against the section SHA1 before
+        being atomically moved into the store.  Return the path in the store
+        and whether the chunk was added.
+        """
+        store_path = self.get_path(section.sha1)
+        if os.path.exists(store_path):
+            return store_path, False
+
+        store_subdir = os.path.dirname(store_path)
+        if not os.path.isdir(store_subdir):
+            try:
+                os.makedirs(store_subdir)
+            except OSError as err:
+                if err.errno != errno.EEXIST:
+                    raise
+
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=store_subdir)
+        try:
+            sha1_hash = hashlib.sha1()
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for block in section.iter_data():
+                    sha1_hash.update(block)
+                    tmp_file.write(block)
+            if section.sha1 != "sha1-" + sha1_hash.hexdigest():
+                raise LfpChunkStoreError("Invalid SHA1 for section %s: %s" % (section.NAME, section.sha1))
+            if os.path.exists(store_path):
+                # Added concurrently by another writer
+                os.remove(tmp_path)
+                return store_path, False
+            os.chmod(tmp_path, 0o644)
+            os.rename(tmp_path, store_path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        log("Create file: %s" % store_path)
+        return store_path, True
+
+    ################################
+    # Linking
+
+    def link(self, sha1, dst_path):
+        """Create a file with a stored chunk, sharing its disk blocks
+
+        A hard link is used where possible, then a reflink (copy-on-write
+        clone), and the data is copied otherwise.
+        """
+        store_path = self.get_path(sha1)
+        if not os.path.exists(store_path):
+            raise LfpChunkStoreError("Cannot find chunk in store: %s" % sha1)
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        log("Create file: %s" % dst_path)
+        try:
+            os.link(store_path, dst_path)
+            return
+        except (OSError, AttributeError):
+            pass
+        try:
+            _reflink(store_path, dst_path)
+            return
+        except (IOError, OSError, ImportError):
+            if os.path.exists(dst_path):
+                os.remove(dst_path)
+        shutil.copyfile(store_path, dst_path)
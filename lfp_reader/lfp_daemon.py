@@ -0,0 +1,300 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Run command lines in a long-lived daemon, keeping LFP Picture files warm
+
+The daemon listens on a UNIX socket and runs the command lines forwarded by
+command-line scripts, one at a time, in the working directory of the client.
+Pictures opened with `load_picture()' stay open between commands, along with
+their metadata, split H.264 stacks and decoded images, until they use more
+than the cache budget or their file changes.
+
+Each request is one line of JSON (`argv' and `cwd'), and each response is
+one line of JSON (`status', `stdout' and `stderr').  Command lines writing
+to standard output as a file (`-'), or profiling or counting I/O, are not
+forwarded.
+"""
+
+
+from __future__ import division, print_function
+
+import os, os.path
+import sys
+import json
+import signal
+import socket
+import tempfile
+import traceback
+from collections import OrderedDict
+
+from . import lfp_logging, lfp_metrics
+from .lfp_logging import log
+from .lfp_picture import LfpPictureFile
+
+if sys.hexversion < 0x03000000:
+    from SocketServer import UnixStreamServer, StreamRequestHandler
+    from StringIO import StringIO as TextIO
+else:
+    from socketserver import UnixStreamServer, StreamRequestHandler
+    from io import StringIO as TextIO
+
+
+# Socket path, when set in environment
+SOCKET_PATH_ENV = 'LFP_DAEMON_SOCKET'
+
+# Disable forwarding, when set in environment
+NO_DAEMON_ENV = 'LFP_NO_DAEMON'
+
+# Options measuring the running process, so not forwarded
+LOCAL_OPTIONS = ('--profile', '--trace', '--metrics')
+
+DEFAULT_CACHE_BUDGET = 1024 * 2**20
+
+
+class LfpDaemonError(Exception):
+    """LFP daemon error"""
+
+
+def get_socket_path():
+    """Return the daemon socket path of the current user"""
+    return os.environ.get(SOCKET_PATH_ENV) or os.path.join(
+            tempfile.gettempdir(), 'lfp-reader-%d' % os.getuid(), 'daemon.sock')
+
+
+def _make_socket_dir(socket_path):
+    """Create the private directory of the default socket path"""
+    socket_dir = os.path.dirname(socket_path)
+    if not os.path.isdir(socket_dir):
+        os.mkdir(socket_dir, 0o700)
+    stat = os.stat(socket_dir)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        raise LfpDaemonError("Socket directory is not private: %s" % socket_dir)
+
+
+################################################################
+# Pictures
+
+class _PictureCache:
+    """Opened LFP Picture files, by absolute path, in least recently used
+    order, closed while over the memory budget
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self._pictures = OrderedDict()
+
+    def get(self, lfp_path):
+        lfp_path = os.path.abspath(lfp_path)
+        stat = os.stat(lfp_path)
+        version = (stat.st_size, stat.st_mtime)
+        if lfp_path in self._pictures:
+            picture_version, lfp = self._pictures.pop(lfp_path)
+            if picture_version != version:
+                lfp.close()
+                lfp = None
+        else:
+            lfp = None
+        if lfp is None:
+            lfp = LfpPictureFile(open(lfp_path, 'rb')).load()
+        self._pictures[lfp_path] = (version, lfp)
+        return lfp
+
+    def evict(self):
+        """Close the least recently used pictures while over the budget,
+        keeping the last one
+        """
+        sizes = dict((lfp_path, lfp.get_memory_size())
+                for lfp_path, (version, lfp) in self._pictures.items())
+        total_size = sum(sizes.values())
+        for lfp_path in list(self._pictures)[:-1]:
+            if total_size <= self.budget:
+                break
+            self._pictures.pop(lfp_path)[1].close()
+            total_size -= sizes[lfp_path]
+
+    def clear(self):
+        while self._pictures:
+            self._pictures.popitem()[1][1].close()
+
+
+_picture_cache = None
+
+
+def load_picture(lfp_file):
+    """Return a loaded `LfpPictureFile' of a file object or path
+
+    In the daemon, the picture is taken from (or kept in) the cache of
+    opened pictures, and the given file object is closed.
+    """
+    if _picture_cache is None:
+        return LfpPictureFile(lfp_file).load()
+    if hasattr(lfp_file, 'name'):
+        lfp_file.close()
+        lfp_file = lfp_file.name
+    return _picture_cache.get(lfp_file)
+
+
+################################################################
+# Daemon
+
+class _DaemonRequestHandler(StreamRequestHandler):
+
+    def handle(self):
+        request_line = self.rfile.readline()
+        if not request_line:
+            # Checking whether the daemon is running
+            return
+        try:
+            request = json.loads(request_line.decode('UTF-8'))
+            status, stdout, stderr = self.server.run_command(request['argv'], request['cwd'])
+        except (ValueError, KeyError) as err:
+            status, stdout, stderr = 2, '', "Invalid daemon request: %s\n" % err
+        response = dict(status=status, stdout=stdout, stderr=stderr)
+        self.wfile.write(json.dumps(response).encode('UTF-8') + b'\n')
+
+
+class LfpDaemon(UnixStreamServer):
+    """Daemon running command lines with `run(argv)', returning their exit
+    status, one at a time
+
+    Use `serve_forever()' to run, and `server_close()' to close the socket
+    and the opened pictures.
+    """
+
+    def __init__(self, run, socket_path=None, cache_budget=DEFAULT_CACHE_BUDGET):
+        global _picture_cache
+        self._run = run
+        if not socket_path:
+            socket_path = get_socket_path()
+            if not os.environ.get(SOCKET_PATH_ENV):
+                _make_socket_dir(socket_path)
+        if _connect(socket_path) is not None:
+            raise LfpDaemonError("Daemon already running on %s" % socket_path)
+        if os.path.exists(socket_path):
+            # Left by a killed daemon
+            os.unlink(socket_path)
+        UnixStreamServer.__init__(self, socket_path, _DaemonRequestHandler)
+        _picture_cache = _PictureCache(cache_budget)
+
+    def server_bind(self):
+        # Only connectable by the current user, from creation on
+        umask = os.umask(0o177)
+        try:
+            UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        global _picture_cache
+        UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        if _picture_cache is not None:
+            _picture_cache.clear()
+            _picture_cache = None
+
+    def run_command(self, argv, cwd):
+        """Run a command line in `cwd', return (status, stdout, stderr)"""
+        stdout, stderr = TextIO(), TextIO()
+        saved = sys.stdout, sys.stderr, os.getcwd()
+        sys.stdout, sys.stderr = stdout, stderr
+        lfp_logging.set_log_stream(stdout)
+        lfp_metrics.get_process_metrics().reset()
+        try:
+            os.chdir(cwd)
+            status = self._run(argv) or 0
+        except SystemExit as err:
+            status = err.code if isinstance(err.code, int) else int(err.code is not None)
+        except Exception as err:
+            # Raised again by scripts in debug mode
+            traceback.print_exc(file=stderr)
+            status = 1
+        finally:
+            sys.stdout, sys.stderr = saved[:2]
+            os.chdir(saved[2])
+            lfp_logging.set_log_stream(sys.stdout)
+            lfp_logging.disable_profiling()
+            lfp_metrics.disable_metrics()
+            _picture_cache.evict()
+        return status, stdout.getvalue(), stderr.getvalue()
+
+
+def serve(run, socket_path=None, cache_budget=DEFAULT_CACHE_BUDGET):
+    """Run command lines of a script in the daemon, until interrupted"""
+    daemon = LfpDaemon(run, socket_path, cache_budget)
+    # Clean up when terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        log("Run daemon on %s" % daemon.server_address)
+        daemon.serve_forever()
+    finally:
+        daemon.server_close()
+
+
+################################################################
+# Forwarding
+
+def _connect(socket_path):
+    if not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except socket.error:
+        sock.close()
+        return None
+    return sock
+
+
+def forward_command(argv, socket_path=None):
+    """Run a command line in the daemon, when it is running, and return its
+    exit status, or `None' when it is not running
+    """
+    if os.environ.get(NO_DAEMON_ENV) or '-' in argv or not hasattr(socket, 'AF_UNIX'):
+        return None
+    if any(arg.split('=', 1)[0] in LOCAL_OPTIONS for arg in argv):
+        return None
+    socket_path = socket_path or get_socket_path()
+    if os.path.exists(socket_path) and os.stat(socket_path).st_uid != os.getuid():
+        # Not sending command lines to a daemon of another user
+        log("Ignore daemon socket of another user: %s" % socket_path)
+        return None
+    sock = _connect(socket_path)
+    if sock is None:
+        return None
+    try:
+        request = dict(argv=list(argv), cwd=os.getcwd())
+        sock.sendall(json.dumps(request).encode('UTF-8') + b'\n')
+        response_file = sock.makefile('rb')
+        try:
+            response_line = response_file.readline()
+        finally:
+            response_file.close()
+    finally:
+        sock.close()
+    if not response_line:
+        raise LfpDaemonError("No response from daemon")
+    response = json.loads(response_line.decode('UTF-8'))
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['status']
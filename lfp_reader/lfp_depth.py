@@ -0,0 +1,143 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Write and upsample depth look-up tables
+
+Raw depth data is a row-major buffer of little-endian 32-bit floats.  It is
+written as text (one row per line), NumPy `.npy' (float32, shape (height,
+width)), PFM (rows bottom to top) or 16-bit grayscale PNG (values scaled to
+the full range, with the range kept in `min_value'/`max_value' text chunks).
+It can also be upsampled into a full-resolution `pil.Image' ('F' mode).
+"""
+
+
+from __future__ import division, print_function
+
+from struct import pack, unpack
+
+from ._utils import pil, check_pil_module
+
+
+DEPTH_FORMATS = ('txt', 'npy', 'pfm', 'png')
+
+
+class LfpDepthError(Exception):
+    """Depth data error"""
+
+
+def _check_depth_data(depth_data, width, height):
+    if len(depth_data) < width * height * 4:
+        raise LfpDepthError("Depth data too short for %dx%d table: %d B" % (width, height, len(depth_data)))
+    return depth_data[:width * height * 4]
+
+
+def unpack_depth_values(depth_data, width, height):
+    """Return depth values as a flat row-major tuple"""
+    depth_data = _check_depth_data(depth_data, width, height)
+    return unpack("<%df" % (width * height), depth_data)
+
+
+def write_depth_txt(file_, depth_data, width, height):
+    values = unpack_depth_values(depth_data, width, height)
+    row_format = "%9f " * width + "\r\n"
+    for y in range(height):
+        file_.write((row_format % values[y*width : (y+1)*width]).encode('ASCII'))
+
+
+def write_depth_npy(file_, depth_data, width, height):
+    depth_data = _check_depth_data(depth_data, width, height)
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (height, width)
+    # Magic (6), version (2) and header length (2), then header padded to 64
+    header += " " * (63 - (10 + len(header)) % 64) + "\n"
+    file_.write(b'\x93NUMPY\x01\x00' + pack("<H", len(header)) + header.encode('ASCII'))
+    file_.write(depth_data)
+
+
+def write_depth_pfm(file_, depth_data, width, height):
+    depth_data = _check_depth_data(depth_data, width, height)
+    # Negative scale stands for little-endian data
+    file_.write(("Pf\n%d %d\n-1.0\n" % (width, height)).encode('ASCII'))
+    row_size = width * 4
+    for y in reversed(range(height)):
+        file_.write(depth_data[y*row_size : (y+1)*row_size])
+
+
+def write_depth_png(file_, depth_data, width, height):
+    from PIL import PngImagePlugin
+    image = get_pil_depth_image(depth_data, width, height)
+    min_value, max_value = image.getextrema()
+    scale = 65535 / (max_value - min_value) if max_value > min_value else 0
+    image = image.point(lambda value: value * scale - min_value * scale).convert('I')
+    png_info = PngImagePlugin.PngInfo()
+    png_info.add_text('min_value', repr(min_value))
+    png_info.add_text('max_value', repr(max_value))
+    image.save(file_, 'png', pnginfo=png_info)
+
+
+_WRITERS = {
+        'txt': write_depth_txt,
+        'npy': write_depth_npy,
+        'pfm': write_depth_pfm,
+        'png': write_depth_png,
+        }
+
+def write_depth(file_, depth_format, depth_data, width, height):
+    """Write raw depth data into a binary file object, in one of DEPTH_FORMATS"""
+    if depth_format not in _WRITERS:
+        raise LfpDepthError("Unknown depth format: %s" % depth_format)
+    _WRITERS[depth_format](file_, depth_data, width, height)
+
+
+################################################################
+# Upsampling
+
+def get_pil_depth_image(depth_data, width, height):
+    """Return depth values as a pil.Image in 'F' mode"""
+    check_pil_module()
+    depth_data = _check_depth_data(depth_data, width, height)
+    frombytes = getattr(pil, 'frombytes', None) or pil.fromstring
+    return frombytes('F', (width, height), depth_data, 'raw', 'F;32F')
+
+
+def upsample_depth(depth_data, width, height, size, edge_threshold=None):
+    """Return depth values resized to `size', as a pil.Image in 'F' mode
+
+    Values are interpolated bilinearly.  With `edge_threshold', the cells
+    whose 3x3 neighborhood spans more than the threshold keep their nearest
+    value instead, so depth edges stay sharp.
+    """
+    from PIL import ImageFilter
+    image = get_pil_depth_image(depth_data, width, height)
+    smooth_image = image.resize(size, pil.BILINEAR)
+    if edge_threshold is None:
+        return smooth_image
+
+    max_values = unpack_depth_values(
+            image.filter(ImageFilter.MaxFilter(3)).tobytes('raw', 'F;32F'), width, height)
+    min_values = unpack_depth_values(
+            image.filter(ImageFilter.MinFilter(3)).tobytes('raw', 'F;32F'), width, height)
+    edges = bytearray(255 if max_value - min_value > edge_threshold else 0
+            for max_value, min_value in zip(max_values, min_values))
+    frombytes = getattr(pil, 'frombytes', None) or pil.fromstring
+    edge_mask = frombytes('L', (width, height), bytes(edges)).resize(size, pil.NEAREST)
+    return pil.composite(image.resize(size, pil.NEAREST), smooth_image, edge_mask)
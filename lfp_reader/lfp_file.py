@@ -30,11 +30,15 @@ from __future__ import division, print_function
 import sys
 import os, os.path
 import json
+import threading
+import contextlib
 from operator import itemgetter
 
-from .lfp_logging import log
+from .lfp_logging import log, span
 from . import lfp_section
-from ._utils import dict_items
+from . import lfp_metrics
+from .lfp_metrics import LfpMetrics, LfpMeteredFile, get_process_metrics
+from ._utils import dict_items, BytesIO
 
 
 ################################################################
@@ -56,17 +60,28 @@ class LfpGenericFile:
         self.meta = None
         self.chunks = {}
         self._is_loaded = False
+        self._export_archive = None
+        self._metrics = LfpMetrics(get_process_metrics())
+        # Shared by all sections, which read the same file object
+        self._file_lock = threading.Lock()
         if isinstance(file_, (str)):
             self._file_path = file_
             self._file = open(self._file_path, 'rb')
         else:
             self._file = file_
             self._file_path = file_.name
+        if lfp_metrics.is_enabled():
+            self._file = LfpMeteredFile(self._file, self._metrics)
         self._file_size = os.stat(self._file_path).st_size
 
     def __del__(self):
+        self.close()
+
+    def close(self):
         if hasattr(self, '_file') and self._file:
-            self._file.close()
+            # Wait for reads in other threads
+            with self._file_lock:
+                self._file.close()
 
     def __repr__(self):
         return "LfpGenericFile(%s, %s, %d chunks)" % (self.header, self.meta, len(self.chunks))
@@ -79,35 +94,54 @@ class LfpGenericFile:
     def file_name(self):
         return os.path.basename(self._file_path)
 
+    @property
+    def metrics(self):
+        """I/O and cache counters of this file, as `LfpMetrics'"""
+        return self._metrics
+
     @property
     def chunks_sorted(self):
         return sorted(dict_items(self.chunks), key=itemgetter(0))
 
+    def get_memory_size(self):
+        """Return an estimate of memory used by data read from file, in bytes"""
+        sections = [self.meta] + list(self.chunks.values())
+        return sum(section.loaded_size for section in sections if section is not None)
+
     ################################
     # Loading
 
     def load(self):
         if self._is_loaded:
-            return
+            return self
+        with span('load', file=self.file_name):
+            self.load_sections()
+            with span('process'):
+                self.process()
+
+        self._is_loaded = True
+        return self
+
+    def load_sections(self):
+        """Read the section headers, without processing their content"""
+        if self.header is not None:
+            return self
         try:
-            self._load_meta()
-            self._load_chunks()
+            with span('read_sections'):
+                self._load_meta()
+                self._load_chunks()
         except lfp_section.LfpReadError:
             raise LfpGenericError("Not a valid LFP file")
-
-        self.process()
-
-        self._is_loaded = True
         return self
 
     def _load_meta(self):
         # Read file
-        self.header = lfp_section.LfpHeader(self._file)
-        self.meta = lfp_section.LfpMeta(self._file)
+        self.header = lfp_section.LfpHeader(self._file, self._file_lock)
+        self.meta = lfp_section.LfpMeta(self._file, self._file_lock)
 
     def _load_chunks(self):
         while self._file.tell() <= self._file_size - lfp_section.LfpSection.MAGIC_LENGTH:
-            chunk = lfp_section.LfpChunk(self._file)
+            chunk = lfp_section.LfpChunk(self._file, self._file_lock)
             self.chunks[chunk.sha1] = chunk
 
     def process(self):
@@ -121,12 +155,34 @@ class LfpGenericFile:
         self.export_meta()
         self.export_chunks()
 
+    def export_to_archive(self, archive, **export_kwargs):
+        """Export into a `LfpArchiveWriter', instead of separate files"""
+        self._export_archive = archive
+        try:
+            self.export(**export_kwargs)
+        finally:
+            self._export_archive = None
+
     def export_meta(self):
-        self.meta.export_data(self.get_export_path('lfp_meta', 'json'))
+        self.export_section(self.meta, 'lfp_meta', 'json')
 
     def export_chunks(self):
         for sha1, chunk in self.chunks_sorted:
-            chunk.export_data(self.get_export_path(sha1[5:], 'data'))
+            self.export_section(chunk, sha1[5:], 'data')
+
+    def export_chunks_to_store(self, store, link=False):
+        """Add data chunks to a `LfpChunkStore', skipping the stored ones
+
+        With `link', also create the usual export files, as links to the
+        stored chunks.  Return the number of chunks added to the store.
+        """
+        added_count = 0
+        for sha1, chunk in sorted(dict_items(self.chunks), key=lambda item: item[1].offset):
+            store_path, added = store.add(chunk)
+            added_count += added
+            if link:
+                store.link(sha1, self.get_export_path(sha1[5:], 'data'))
+        return added_count
 
     def get_export_path(self, exp_name, exp_ext=None):
         prefix, lfp_ext = os.path.splitext(self._file_path)
@@ -139,9 +195,37 @@ class LfpGenericFile:
 
     def export_write(self, exp_name, exp_ext, exp_data):
         exp_path = self.get_export_path(exp_name, exp_ext)
-        with open(exp_path, 'wb') as exp_file:
-            log("Create file: %s" % exp_path)
-            exp_file.write(exp_data)
+        with span('export_write', target=exp_name, size=len(exp_data)):
+            if self._export_archive:
+                self._export_archive.add_data(os.path.basename(exp_path), exp_data)
+                return
+            with open(exp_path, 'wb') as exp_file:
+                log("Create file: %s" % exp_path)
+                exp_file.write(exp_data)
+
+    @contextlib.contextmanager
+    def export_open(self, exp_name, exp_ext):
+        """Return a context manager of a binary file object to write an
+        export file into, added to the export archive on exit, if any
+        """
+        exp_path = self.get_export_path(exp_name, exp_ext)
+        with span('export_write', target=exp_name):
+            if self._export_archive:
+                exp_file = BytesIO()
+                yield exp_file
+                self._export_archive.add_data(os.path.basename(exp_path), exp_file.getvalue())
+                return
+            with open(exp_path, 'wb') as exp_file:
+                log("Create file: %s" % exp_path)
+                yield exp_file
+
+    def export_section(self, section, exp_name, exp_ext=None):
+        exp_path = self.get_export_path(exp_name, exp_ext)
+        with span('export_write', target=exp_name, size=section.size):
+            if self._export_archive:
+                self._export_archive.add_section(os.path.basename(exp_path), section)
+                return
+            section.export_data(exp_path)
 
 
     ################################
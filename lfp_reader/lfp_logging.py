@@ -21,12 +21,28 @@
 # Copyright (C) 2012-2013  Behnam Esfahbod
 
 
-"""Control logging behavior for lfp_reader package
+"""Control logging and profiling behavior for lfp_reader package
+
+Profiling records nested timing spans, which can be written as JSON or in the
+Chrome trace format (for chrome://tracing), or summarized as a text report.
+When profiling is disabled, spans cost a function call and a global lookup.
 """
 
 
 from __future__ import division, print_function
 
+import os
+import sys
+import time
+import json
+import threading
+from collections import namedtuple
+
+from . import lfp_metrics
+
+
+################################################################
+# Logging
 
 _log_stream = None
 
@@ -40,3 +56,189 @@ def log(*args, **kwargs):
     if _log_stream:
         print(file=_log_stream, *args, **kwargs)
 
+
+
+################################################################
+# Profiling
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+_profile_spans = None
+_profile_start = 0.
+_local = threading.local()
+
+SpanRecord = namedtuple('SpanRecord',
+        'name path start duration self_duration thread args')
+
+
+class _NullSpan(object):
+    """Span used when profiling is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    """Timed span, nested in the enclosing span of the same thread"""
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = _get_span_stack()
+        self.path = (stack[-1].path if stack else ()) + (self.name,)
+        self.children_duration = 0.
+        stack.append(self)
+        self.start = _timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = _timer() - self.start
+        stack = _get_span_stack()
+        stack.pop()
+        if stack:
+            stack[-1].children_duration += duration
+        spans = _profile_spans
+        if spans is not None:
+            spans.append(SpanRecord(
+                name=self.name,
+                path=self.path,
+                start=self.start - _profile_start,
+                duration=duration,
+                self_duration=duration - self.children_duration,
+                thread=threading.current_thread().ident,
+                args=self.args))
+
+
+def _get_span_stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def span(name, **args):
+    """Return a context manager timing a named stage, when profiling"""
+    if _profile_spans is None:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def enable_profiling():
+    """Start recording spans, dropping the previous ones"""
+    global _profile_spans, _profile_start
+    _profile_start = _timer()
+    _profile_spans = []
+
+
+def disable_profiling():
+    global _profile_spans
+    _profile_spans = None
+
+
+def is_profiling():
+    return _profile_spans is not None
+
+
+def get_spans():
+    """Return recorded spans, ordered by start time"""
+    return sorted(_profile_spans or [], key=lambda record: record.start)
+
+
+def write_profile(file_, profile_format='json'):
+    """Write recorded spans as JSON or Chrome trace ('json' or 'chrome')"""
+    spans = get_spans()
+    if profile_format == 'json':
+        content = dict(spans=[ dict(
+            name=record.name,
+            path=list(record.path),
+            start=record.start,
+            duration=record.duration,
+            self_duration=record.self_duration,
+            thread=record.thread,
+            args=record.args) for record in spans ])
+    elif profile_format == 'chrome':
+        content = dict(displayTimeUnit='ms', traceEvents=[ dict(
+            name=record.name,
+            cat='lfp_reader',
+            ph='X',
+            ts=record.start * 1e6,
+            dur=record.duration * 1e6,
+            pid=os.getpid(),
+            tid=record.thread,
+            args=record.args) for record in spans ])
+    else:
+        raise ValueError("Unknown profile format: %s" % profile_format)
+    if isinstance(file_, str):
+        with open(file_, 'w') as output_file:
+            json.dump(content, output_file, indent=1, default=str)
+    else:
+        json.dump(content, file_, indent=1, default=str)
+
+
+def get_profile_report():
+    """Return recorded spans as a text tree, aggregated by nesting path"""
+    totals = {}
+    children = {(): []}
+    for record in get_spans():
+        if record.path not in totals:
+            totals[record.path] = [0, 0., 0.]
+            children[record.path] = []
+            children.setdefault(record.path[:-1], []).append(record.path)
+        total = totals[record.path]
+        total[0] += 1
+        total[1] += record.duration
+        total[2] += record.self_duration
+
+    lines = ["%-50s %8s %12s %12s" % ("Span", "Calls", "Total", "Self")]
+    def add_lines(parent):
+        for path in children.get(parent, []):
+            count, duration, self_duration = totals[path]
+            lines.append("%-50s %8d %10.2fms %10.2fms" % ("  " * (len(path) - 1) + path[-1],
+                count, duration * 1000, self_duration * 1000))
+            add_lines(path)
+    add_lines(())
+    return "\n".join(lines)
+
+
+def print_profile_report(file_=None):
+    print(get_profile_report(), file=file_ or sys.stderr)
+
+
+################################################################
+# Command-line scripts
+
+def add_instrument_arguments(parser):
+    """Add the profiling and I/O counting options to an argument parser"""
+    parser.add_argument('--profile', action='store_true',
+            help="Print a report of timing spans to standard error")
+    parser.add_argument('--trace', metavar='trace.json',
+            help="Write timing spans in Chrome trace format (see chrome://tracing)")
+    parser.add_argument('--metrics', action='store_true',
+            help="Print I/O and cache counters to standard error")
+
+
+def run_instrumented(args):
+    """Run the subcommand of parsed arguments, with the profiling and I/O
+    counting of `add_instrument_arguments()' options, writing their reports
+    """
+    if args.profile or args.trace:
+        enable_profiling()
+    if args.metrics:
+        lfp_metrics.enable_metrics()
+    try:
+        return args.subcmd(**dict(args._get_kwargs()))
+    finally:
+        if args.trace:
+            write_profile(args.trace, 'chrome')
+        if args.profile:
+            print_profile_report(sys.stderr)
+        if args.metrics:
+            lfp_metrics.get_process_metrics().print_report(sys.stderr)
@@ -0,0 +1,142 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Count file I/O and cache usage of LFP files
+
+Each LFP file object has its own counters, which are also added up into the
+process-wide counters.  File I/O is only counted for files opened after
+`enable_metrics()'.
+"""
+
+
+from __future__ import division, print_function
+
+import sys
+import threading
+
+
+class LfpMetrics:
+    """Set of named counters, optionally added up into a parent set
+    """
+
+    COUNTERS = (
+            'reads', 'bytes_read', 'seeks',
+            'meta_content_hits', 'meta_content_misses',
+            'pil_cache_hits', 'pil_cache_misses',
+            )
+
+    def __init__(self, parent=None):
+        self._parent = parent
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "LfpMetrics(%s)" % ", ".join("%s=%d" % item for item in self.items())
+
+    def __getitem__(self, name):
+        return self._counters[name]
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        if self._parent is not None:
+            self._parent.incr(name, value)
+
+    def items(self):
+        return [ (name, self._counters[name]) for name in
+                list(self.COUNTERS) + sorted(set(self._counters) - set(self.COUNTERS)) ]
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def print_report(self, file_=None):
+        file_ = file_ or sys.stderr
+        for name, value in self.items():
+            file_.write("%-24s %14d\n" % (name + ":", value))
+
+
+_process_metrics = LfpMetrics()
+
+def get_process_metrics():
+    """Return the counters of all LFP files of the process"""
+    return _process_metrics
+
+
+_is_enabled = False
+
+def enable_metrics():
+    """Count file I/O of LFP files opened from now on"""
+    global _is_enabled
+    _is_enabled = True
+
+
+def disable_metrics():
+    global _is_enabled
+    _is_enabled = False
+
+
+def is_enabled():
+    return _is_enabled
+
+
+class LfpMeteredFile:
+    """File object wrapper, counting reads, read bytes and seeks
+    """
+
+    def __init__(self, file_, metrics):
+        self._file = file_
+        self.metrics = metrics
+
+    def __repr__(self):
+        return "LfpMeteredFile(%r)" % self._file
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self.metrics.incr('reads')
+        self.metrics.incr('bytes_read', len(data))
+        return data
+
+    def seek(self, offset, whence=0):
+        self.metrics.incr('seeks')
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def close(self):
+        return self._file.close()
+
+
+def count(file_, name, value=1):
+    """Increment a counter of a metered file, if it is one"""
+    metrics = getattr(file_, 'metrics', None)
+    if metrics is not None:
+        metrics.incr(name, value)
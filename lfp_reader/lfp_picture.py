@@ -29,13 +29,15 @@ from __future__ import division, print_function
 
 import sys
 import math
-from struct import unpack
+import threading
 from collections import namedtuple
 
 from . import lfp_file
+from . import lfp_depth
+from .lfp_logging import span
 from ._utils import (
-        StringIO, dict_items,
-        pil, check_pil_module,
+        BytesIO, dict_items, LruCache,
+        pil, pil_antialias, check_pil_module,
         gst_h264_splitter, check_gst_h264_splitter_module )
 
 
@@ -46,6 +48,9 @@ class LfpPictureError(lfp_file.LfpGenericError):
     """LFP Picture file error"""
 
 
+_h264_lock = threading.Lock()
+
+
 def _lfp_picture_data_class(cls_name, *args):
     """Store formatted data for LFP Picture file"""
     return namedtuple(cls_name, *args)
@@ -72,10 +77,50 @@ Coord = _lfp_picture_data_class('Coord',
         'x y')
 
 
+def _resize_box(pil_image, size, resample, box):
+    """Resize the `box' region of an image, without cropping it first when
+    PIL supports it (Pillow 4.1+)
+    """
+    try:
+        return pil_image.resize(size, resample, box)
+    except TypeError:
+        return pil_image.crop(tuple(int(round(v)) for v in box)).resize(size, resample)
+
+
+def _get_pil_image_size(pil_image):
+    """Return an estimate of memory used by pixels of a pil.Image"""
+    # PIL keeps multi-band and 32-bit pixels in 4 bytes
+    pixel_size = 1 if pil_image.mode in ('1', 'L', 'P') else 4
+    return pil_image.size[0] * pil_image.size[1] * pixel_size
+
+
+def read_depth_table(depth_data, width, height):
+    """Return depth look-up table as a list of columns, table[x][y]"""
+    values = lfp_depth.unpack_depth_values(depth_data, width, height)
+    return [ list(values[i::width]) for i in range(width) ]
+
+
 class LfpPictureFile(lfp_file.LfpGenericFile):
     """Load an LFP Picture file and read the data chunks on-demand
     """
 
+    # Number of lambda map sizes kept in cache
+    LAMBDA_MAP_CACHE_SIZE = 4
+    # Lambda difference between neighbor depth cells, seen as an edge
+    LAMBDA_EDGE_THRESHOLD = 1.
+    # Lambda step of interpolated refocus images
+    REFOCUS_LAMBDA_STEP = .05
+    # Number of interpolated refocus images kept in cache
+    REFOCUS_CACHE_SIZE = 8
+    # Number of all-focused images (by size and box) kept in cache
+    ALL_FOCUSED_CACHE_SIZE = 4
+    # Viewpoint step of interpolated parallax images, relative to viewpoint size
+    PARALLAX_VIEWPOINT_STEP = .01
+    # Number of interpolated parallax images kept in cache
+    PARALLAX_CACHE_SIZE = 8
+    # Number of resized refocus and parallax images kept in cache
+    RESIZED_CACHE_SIZE = 64
+
     ################################
     # Internals
 
@@ -85,6 +130,13 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
         self._refocus_stack = None
         self._parallax_stack = None
         self._pil_cache = {}
+        self._lambda_map_cache = LruCache(self.LAMBDA_MAP_CACHE_SIZE)
+        self._refocus_cache = LruCache(self.REFOCUS_CACHE_SIZE)
+        self._parallax_cache = LruCache(self.PARALLAX_CACHE_SIZE)
+        self._all_focused_cache = LruCache(self.ALL_FOCUSED_CACHE_SIZE)
+        self._resized_cache = LruCache(self.RESIZED_CACHE_SIZE)
+        self._refocus_image_ids_map = None
+        self._h264_blocks = {}
 
     def __repr__(self):
         version = self.meta.content['version']
@@ -95,6 +147,46 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
             'True' if self._frame else 'False'
             ))
 
+    def get_memory_size(self):
+        """Return an estimate of memory used by data read from file, and
+        decoded and cached images, in bytes
+        """
+        size = lfp_file.LfpGenericFile.get_memory_size(self)
+        size += self.get_cached_images_size()
+        # Images split from H.264 blocks
+        for stack_images in (
+                self._refocus_stack.refocus_images if self._refocus_stack else {},
+                self._parallax_stack.parallax_images if self._parallax_stack else {}):
+            size += sum(len(img.data) for img in stack_images.values() if img.data)
+        return size
+
+    def get_cached_images_size(self):
+        """Return an estimate of memory used by pixels of decoded, resized
+        and rendered images kept in cache, in bytes
+        """
+        images = {}
+        for group_images in list(self._pil_cache.values()):
+            images.update((id(image), image) for image in list(group_images.values()))
+        for cache in (self._lambda_map_cache, self._refocus_cache, self._parallax_cache,
+                self._all_focused_cache, self._resized_cache):
+            images.update((id(image), image) for image in cache.values())
+        return sum(_get_pil_image_size(image) for image in images.values())
+
+    def clear_caches(self, rendered=True, resized=False, decoded=False):
+        """Drop cached images: `rendered' refocus, parallax and all-focused
+        images, `resized' refocus and parallax images, and `decoded'
+        full-size images
+        """
+        if rendered:
+            for cache in (self._lambda_map_cache, self._refocus_cache,
+                    self._parallax_cache, self._all_focused_cache):
+                cache.clear()
+        if resized:
+            self._resized_cache.clear()
+        if decoded:
+            self._pil_cache.clear()
+
+
     ################################
     # Loading
 
@@ -137,21 +229,17 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
                         elif 'blockOfImages' in accel_content:
                             block_of_images = accel_content['blockOfImages']
                             if block_of_images['representation'] == 'h264':
-                                # H264-encoded refocus stack
-                                check_gst_h264_splitter_module()
-                                images_representation = 'jpeg'
-                                h264_data = self.chunks[block_of_images['blockOfImagesRef']].data
-                                h264_splitter = gst_h264_splitter.H246Splitter(h264_data, image_format=images_representation)
-                                images_data = h264_splitter.get_images()
+                                # H264-encoded refocus stack, decoded on first use
+                                self._h264_blocks['refocus'] = self.chunks[block_of_images['blockOfImagesRef']]
                                 for id, rimg in enumerate(block_of_images['metadataArray']):
                                     refocus_images[id] = RefocusImage(
                                             id=id,
                                             lambda_=rimg['lambda'],
                                             width=rimg['width'],
                                             height=rimg['height'],
-                                            representation=images_representation,
+                                            representation='jpeg',
                                             chunk=None,
-                                            data=images_data[id])
+                                            data=None)
 
                             else:
                                 raise KeyError('Unsupported Processed LFP Picture file')
@@ -163,10 +251,8 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
                         depth_width  = accel_content['depthLut']['width']
                         depth_height = accel_content['depthLut']['height']
                         depth_data  = self.chunks[accel_content['depthLut']['imageRef']].data
-                        depth_table = [ [
-                            unpack("f", depth_data[ (j*depth_width + i) * 4 : (j*depth_width + i+1) * 4 ])[0]
-                            for j in range(depth_height) ]
-                            for i in range(depth_width) ]
+                        with span('read_depth_table'):
+                            depth_table = read_depth_table(depth_data, depth_width, depth_height)
 
                         depth_lut = DepthLut(
                                 width=depth_width,
@@ -193,21 +279,17 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
                         parallax_images = { }
 
                         if block_of_images['representation'] == 'h264':
-                            # H264-encoded parallax stack
-                            check_gst_h264_splitter_module()
-                            images_representation = 'jpeg'
-                            h264_data = self.chunks[block_of_images['blockOfImagesRef']].data
-                            h264_splitter = gst_h264_splitter.H246Splitter(h264_data, image_format=images_representation)
-                            images_data = h264_splitter.get_images()
+                            # H264-encoded parallax stack, decoded on first use
+                            self._h264_blocks['parallax'] = self.chunks[block_of_images['blockOfImagesRef']]
                             for id, pimg in enumerate(block_of_images['metadataArray']):
                                 parallax_images[id] = ParallaxImage(
                                     id=id,
                                     coord=Coord(**pimg['coord']),
                                     width=pimg['width'],
                                     height=pimg['height'],
-                                    representation=images_representation,
+                                    representation='jpeg',
                                     chunk=None,
-                                    data=images_data[id])
+                                    data=None)
 
                         max_coord_x_i = max(parallax_images, key=lambda id: parallax_images[id].coord.x)
                         max_coord_y_i = max(parallax_images, key=lambda id: parallax_images[id].coord.y)
@@ -252,55 +334,66 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
     ################################
     # Exporting
 
-    def export(self):
+    def export(self, depth_formats=('txt',)):
         if self._frame:
             self.export_frame()
         if self._refocus_stack:
-            self.export_refocus_stack()
+            self.export_refocus_stack(depth_formats)
             self.export_all_focused()
         if self._parallax_stack:
             self.export_parallax_stack()
 
     def export_frame(self):
-        self._frame.metadata.export_data(self.get_export_path('frame_metadata', 'json'))
-        self._frame.image.export_data(self.get_export_path('frame', 'raw'))
-        self._frame.private_metadata.export_data(self.get_export_path('frame_private_metadata', 'json'))
+        self.export_section(self._frame.metadata, 'frame_metadata', 'json')
+        self.export_section(self._frame.image, 'frame', 'raw')
+        self.export_section(self._frame.private_metadata, 'frame_private_metadata', 'json')
 
-    def export_refocus_stack(self):
+    def export_refocus_stack(self, depth_formats=('txt',)):
         for id, rimg in dict_items(self._refocus_stack.refocus_images):
             r_image_name = 'refocus_%02d' % id
             if rimg.chunk:
-                rimg.chunk.export_data(self.get_export_path(r_image_name, rimg.representation))
+                self.export_section(rimg.chunk, r_image_name, rimg.representation)
             else:
-                self.export_write(r_image_name, rimg.representation, rimg.data)
+                self.export_write(r_image_name, rimg.representation, self.get_image_data('refocus', id))
+
+        self.export_section(self._refocus_stack.depth_lut.chunk, 'depth_lut',
+            self._refocus_stack.depth_lut.representation)
+        self.export_depth_lut(depth_formats)
 
-        self._refocus_stack.depth_lut.chunk.export_data(self.get_export_path('depth_lut',
-            self._refocus_stack.depth_lut.representation))
-        self.export_write('depth_lut', 'txt', self.get_depth_lut_txt())
+    def export_depth_lut(self, depth_formats=('txt',)):
+        """Export depth look-up table in formats of `lfp_depth.DEPTH_FORMATS'"""
+        for depth_format in depth_formats:
+            with self.export_open('depth_lut', depth_format) as exp_file:
+                self.write_depth_lut(exp_file, depth_format)
 
     def export_parallax_stack(self):
         for id, pimg in dict_items(self._parallax_stack.parallax_images):
             r_image_name = 'parallax_%02d' % id
             if pimg.chunk:
-                pimg.chunk.export_data(self.get_export_path(r_image_name, pimg.representation))
+                self.export_section(pimg.chunk, r_image_name, pimg.representation)
             else:
-                self.export_write(r_image_name, pimg.representation, pimg.data)
+                self.export_write(r_image_name, pimg.representation, self.get_image_data('parallax', id))
 
     def export_all_focused(self, export_format='jpeg'):
         pil_all_focused_image = self.get_pil_image('all_focused')
-        output = StringIO()
+        output = BytesIO()
         pil_all_focused_image.save(output, export_format)
         self.export_write('all_focused', export_format, output.getvalue())
         output.close()
 
+    def write_depth_lut(self, file_, depth_format='txt'):
+        """Write depth look-up table into a binary file object"""
+        depth_lut = self.get_refocus_stack().depth_lut
+        lfp_depth.write_depth(file_, depth_format,
+                self._get_depth_lut_data(), depth_lut.width, depth_lut.height)
+
+    def get_depth_lut_data(self, depth_format='txt'):
+        output = BytesIO()
+        self.write_depth_lut(output, depth_format)
+        return output.getvalue()
+
     def get_depth_lut_txt(self):
-        depth_lut = self._refocus_stack.depth_lut
-        txt = ""
-        for i in range(depth_lut.width):
-            for j in range(depth_lut.height):
-                txt += "%9f " % depth_lut.table[j][i]
-            txt += "\r\n"
-        return txt
+        return self.get_depth_lut_data('txt').decode('ASCII')
 
 
     ################################
@@ -369,27 +462,153 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
         if group not in ('refocus', 'parallax', 'all_focused'):
             raise KeyError('Unknown pil cache group: %s' % group)
         cache = self._pil_cache
-        if group not in cache:
-            cache[group] = {}
+        # Atomic, as images may be decoded in other threads
+        cache.setdefault(group, {})
 
         if group == 'all_focused' and image_id is None:
             image_id = '_'
             if image_id not in cache[group]:
+                self._metrics.incr('pil_cache_misses')
                 cache[group][image_id] = self._gen_pil_all_focused_image()
+            else:
+                self._metrics.incr('pil_cache_hits')
             return cache[group][image_id]
 
-        if group == 'refocus' and image_id is not None:
-            img = self.get_refocus_stack().refocus_images[image_id]
-        elif group == 'parallax' and image_id is not None:
-            img = self.get_parallax_stack().parallax_images[image_id]
-        else:
+        if image_id is None or image_id not in self._get_stack_images(group):
             raise KeyError('Invalid image_id: %s' % image_id)
 
         if image_id not in cache[group]:
-            data = img.data if img.data else img.chunk.data
-            cache[group][image_id] = pil.open(StringIO(data))
+            self._metrics.incr('pil_cache_misses')
+            cache[group][image_id] = self.decode_pil_image(group, image_id)
+        else:
+            self._metrics.incr('pil_cache_hits')
         return cache[group][image_id]
 
+    def decode_pil_image(self, group, image_id, size=None):
+        """Decode and return a pil.Image instance, without caching it
+
+        With `size', the image is decoded at reduced resolution (when the
+        format allows) and resized to fit in `size'.
+        """
+        check_pil_module()
+        data = self.get_image_data(group, image_id)
+        with span('decode_image', group=group, id=image_id):
+            pil_image = pil.open(BytesIO(data))
+            if size:
+                pil_image.draft('RGB', tuple(size))
+                pil_image.thumbnail(tuple(size), pil_antialias)
+            else:
+                pil_image.load()
+        return pil_image
+
+    def _get_stack_images(self, group):
+        if group == 'refocus':
+            return self.get_refocus_stack().refocus_images
+        elif group == 'parallax':
+            return self.get_parallax_stack().parallax_images
+        raise KeyError('Unknown image group: %s' % group)
+
+    def get_image_data(self, group, image_id):
+        """Return encoded data of a refocus or parallax image
+
+        H.264-encoded stacks are decoded on first use.
+        """
+        images = self._get_stack_images(group)
+        if group in self._h264_blocks:
+            self._decode_h264_block(group)
+        img = images[image_id]
+        return img.data if img.data else img.chunk.data
+
+    def _decode_h264_block(self, group):
+        check_gst_h264_splitter_module()
+        # Splitters share one main loop
+        with _h264_lock:
+            if group not in self._h264_blocks:
+                return
+            h264_data = self._h264_blocks[group].data
+            with span('decode_h264', size=len(h264_data)):
+                h264_splitter = gst_h264_splitter.H246Splitter(h264_data, image_format='jpeg')
+                images_data = h264_splitter.get_images()
+            images = self._get_stack_images(group)
+            for id in images:
+                images[id] = images[id]._replace(data=images_data[id])
+            del self._h264_blocks[group]
+
+    def get_pil_thumbnail(self, size):
+        """Return pil.Image of the default view, fitting in `size'
+
+        The default-lambda refocus image (or the central parallax image) is
+        decoded at reduced resolution, and not cached.
+        """
+        check_pil_module()
+        if self.has_refocus_stack():
+            group = 'refocus'
+            image_id = self.find_closest_refocus_image_by_lambda(self.get_default_lambda()).id
+        elif self.has_parallax_stack():
+            group = 'parallax'
+            image_id = self.find_closest_parallax_image().id
+        else:
+            raise LfpPictureError("%s: Cannot find processed images in LFP Picture file" % self.file_path)
+        return self.decode_pil_image(group, image_id, size)
+
+    def _get_resized_image(self, group, image_id, size):
+        """Return a refocus or parallax pil.Image resized to `size'
+
+        Images not decoded yet are decoded at reduced resolution, when the
+        format allows, and are not cached at full size.  The last few resized
+        images are cached.
+        """
+        full_images = self._pil_cache.get(group, {})
+        if size is None or (image_id in full_images and full_images[image_id].size == size):
+            return self.get_pil_image(group, image_id)
+        key = (group, image_id, size)
+        resized_image = self._resized_cache.get(key)
+        if resized_image is None:
+            if image_id in full_images:
+                pil_image = self.get_pil_image(group, image_id)
+            else:
+                data = self.get_image_data(group, image_id)
+                with span('decode_image', group=group, id=image_id, size=size):
+                    pil_image = pil.open(BytesIO(data))
+                    pil_image.draft('RGB', size)
+            resized_image = pil_image.resize(size, pil_antialias)
+            self._resized_cache.put(key, resized_image)
+        return resized_image
+
+    def get_preload_order(self, lambda_=None, viewpoint=(.5, .5), first_group='refocus'):
+        """Return (group, image_id) of refocus and parallax images, the
+        closest to `lambda_' (default: default lambda) and `viewpoint' first
+
+        Images of `first_group' come before the other group.
+        """
+        refocus_ids, parallax_ids = [], []
+        if self.has_refocus_stack():
+            rimgs = self.get_refocus_stack().refocus_images
+            if lambda_ is None:
+                lambda_ = self.get_default_lambda()
+            refocus_ids = [ ('refocus', id) for id in
+                    sorted(rimgs, key=lambda id: math.fabs(rimgs[id].lambda_ - lambda_)) ]
+        if self.has_parallax_stack():
+            pimgs = self.get_parallax_stack().parallax_images
+            vc = self._get_viewpoint_coord(*viewpoint)
+            parallax_ids = [ ('parallax', id) for id in
+                    sorted(pimgs, key=lambda id: math.hypot(pimgs[id].coord.x - vc.x,
+                                                            pimgs[id].coord.y - vc.y)) ]
+        if first_group == 'parallax':
+            return parallax_ids + refocus_ids
+        return refocus_ids + parallax_ids
+
+    def preload_resized_images(self, group_ids, size, is_cancelled=None):
+        """Resize (group, image_id) images to `size' into cache, in order
+
+        Meant to run in a background thread, until `is_cancelled()' returns
+        true.  Only as many images as the cache holds are resized.
+        """
+        for group, image_id in list(group_ids)[:self.RESIZED_CACHE_SIZE]:
+            if is_cancelled and is_cancelled():
+                return
+            self._get_resized_image(group, image_id, tuple(size))
+
     def preload_pil_images(self):
         if self.has_refocus_stack():
             for id in self.get_refocus_stack().refocus_images:
@@ -430,30 +649,201 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
                 key=lambda id: math.fabs(rstk.refocus_images[id].lambda_ - lambda_))
         return rstk.refocus_images[closest_image_id]
 
+    def find_bracketing_refocus_images(self, lambda_):
+        """Return refocus images with the closest lambdas below and above
+        `lambda_', and the weight of the latter (in range [0, 1])
+
+        Out of the range of the stack, both images are the closest one.
+        """
+        rstk = self.get_refocus_stack()
+        rimgs = sorted(rstk.refocus_images.values(), key=lambda rimg: rimg.lambda_)
+        if lambda_ <= rimgs[0].lambda_:
+            return rimgs[0], rimgs[0], 0.
+        for lower, upper in zip(rimgs, rimgs[1:]):
+            if lambda_ <= upper.lambda_:
+                return lower, upper, (lambda_ - lower.lambda_) / (upper.lambda_ - lower.lambda_)
+        return rimgs[-1], rimgs[-1], 0.
+
+    def render_refocus_interpolated(self, lambda_, size=None):
+        """Return pil.Image refocused at `lambda_', blended from the two
+        refocus images around it, at `size' (default: image size)
+
+        Lambda is rounded to REFOCUS_LAMBDA_STEP.  The last few images are
+        cached.
+        """
+        check_pil_module()
+        step = int(round(lambda_ / self.REFOCUS_LAMBDA_STEP))
+        size = tuple(size) if size else None
+        key = (step, size)
+        pil_image = self._refocus_cache.get(key)
+        if pil_image is not None:
+            return pil_image
+        lower, upper, weight = self.find_bracketing_refocus_images(
+                step * self.REFOCUS_LAMBDA_STEP)
+        with span('render_refocus', lambda_=step * self.REFOCUS_LAMBDA_STEP, size=size):
+            if weight <= 0:
+                pil_image = self._get_resized_image('refocus', lower.id, size)
+            elif weight >= 1:
+                pil_image = self._get_resized_image('refocus', upper.id, size)
+            else:
+                pil_image = pil.blend(
+                        self._get_resized_image('refocus', lower.id, size),
+                        self._get_resized_image('refocus', upper.id, size),
+                        weight)
+        self._refocus_cache.put(key, pil_image)
+        return pil_image
+
     def _gen_pil_all_focused_image(self):
         """Return pil.Image instance collaged from refocus images
         """
+        return self.render_all_focused()
+
+    def render_all_focused(self, size=None, box=None):
+        """Return pil.Image of the `box' region of the all-focused image,
+        resized to `size'
+
+        Parameter `box' is (left, upper, right, lower) in refocus image
+        pixels (default: whole image), and `size' defaults to the box size.
+        Only the depth cells in the region are pasted, from the refocus
+        images in focus there, resized once.  Images decoded for a box are
+        not cached, but the last few all-focused images are.
+        """
         check_pil_module()
         rstk = self.get_refocus_stack()
+        box = tuple(box) if box else None
+        if box is not None and not (0 <= box[0] < box[2] <= rstk.width
+                and 0 <= box[1] < box[3] <= rstk.height):
+            raise LfpPictureError("%s: Invalid all-focused box: %r" % (self.file_path, box))
+        full_box = box or (0, 0, rstk.width, rstk.height)
+        size = tuple(size) if size else (full_box[2] - full_box[0], full_box[3] - full_box[1])
+        if size[0] <= 0 or size[1] <= 0:
+            raise LfpPictureError("%s: Invalid all-focused size: %r" % (self.file_path, size))
+        key = (size, box)
+        pil_image = self._all_focused_cache.get(key)
+        if pil_image is not None:
+            return pil_image
+
+        with span('all_focused', size=size, box=box):
+            pieces = self._get_all_focused_pieces(size, full_box)
+            pil_image = pil.new('RGB', size)
+            resized_images = {}
+            for image_id, piece_box in pieces:
+                if image_id not in resized_images:
+                    if box is None:
+                        resized_images[image_id] = self._get_resized_image('refocus', image_id, size)
+                    else:
+                        resized_images[image_id] = self._get_box_image(image_id, size, box)
+                pil_image.paste(resized_images[image_id].crop(piece_box), piece_box)
+        self._all_focused_cache.put(key, pil_image)
+        return pil_image
+
+    def _get_box_image(self, image_id, size, box):
+        """Return the `box' region of a refocus image resized to `size'
+
+        Images not decoded yet are decoded at the reduced resolution the
+        region needs, when the format allows, and are not cached.
+        """
+        rstk = self.get_refocus_stack()
+        if image_id in self._pil_cache.get('refocus', {}):
+            pil_image = self.get_pil_image('refocus', image_id)
+        else:
+            draft_size = (int(math.ceil(rstk.width * size[0] / (box[2] - box[0]))),
+                          int(math.ceil(rstk.height * size[1] / (box[3] - box[1]))))
+            data = self.get_image_data('refocus', image_id)
+            with span('decode_image', group='refocus', id=image_id, size=draft_size):
+                pil_image = pil.open(BytesIO(data))
+                pil_image.draft('RGB', draft_size)
+        scale_x = pil_image.size[0] / rstk.width
+        scale_y = pil_image.size[1] / rstk.height
+        return _resize_box(pil_image, size, pil_antialias, (box[0] * scale_x,
+                box[1] * scale_y, box[2] * scale_x, box[3] * scale_y))
+
+    def _get_all_focused_pieces(self, size, box):
+        """Return list of (refocus image id, output box) of depth cells in
+        `box', merging neighbor cells of the same image in each row
+        """
+        rstk = self.get_refocus_stack()
         depth_lut = rstk.depth_lut
-        r_images  = rstk.refocus_images
-        width     = rstk.width
-        height    = rstk.height
-
-        init_data = r_images[0].data if r_images[0].data else r_images[0].chunk.data
-        pil_all_focused_image = pil.open(StringIO(init_data))
-
-        for i in range(depth_lut.width):
-            for j in range(depth_lut.height):
-                box = (int(math.floor(width  * i / depth_lut.width)),
-                       int(math.floor(height * j / depth_lut.height)),
-                       int(math.floor(width  * (i+1) / depth_lut.width)),
-                       int(math.floor(height * (j+1) / depth_lut.height)))
-                closest_image = self.find_closest_refocus_image_by_lut_idx(i, j)
-                pil_all_focused = self.get_pil_image('refocus', closest_image.id)
-                piece = pil_all_focused.crop(box)
-                pil_all_focused_image.paste(piece, box)
-        return pil_all_focused_image
+        scale_x = size[0] / (box[2] - box[0])
+        scale_y = size[1] / (box[3] - box[1])
+        def out_x(i):
+            x = math.floor(rstk.width * i / depth_lut.width)
+            return max(0, min(int(round((x - box[0]) * scale_x)), size[0]))
+        def out_y(j):
+            y = math.floor(rstk.height * j / depth_lut.height)
+            return max(0, min(int(round((y - box[1]) * scale_y)), size[1]))
+
+        i_range = (max(0, int(box[0] * depth_lut.width // rstk.width)),
+                   min(depth_lut.width, int(-(-box[2] * depth_lut.width // rstk.width))))
+        j_range = (max(0, int(box[1] * depth_lut.height // rstk.height)),
+                   min(depth_lut.height, int(-(-box[3] * depth_lut.height // rstk.height))))
+        image_ids = self._get_refocus_image_ids_map()
+        pieces = []
+        for j in range(*j_range):
+            y0, y1 = out_y(j), out_y(j + 1)
+            if y0 == y1:
+                continue
+            i = i_range[0]
+            while i < i_range[1]:
+                image_id = image_ids[i][j]
+                k = i + 1
+                while k < i_range[1] and image_ids[k][j] == image_id:
+                    k += 1
+                x0, x1 = out_x(i), out_x(k)
+                if x0 < x1:
+                    pieces.append((image_id, (x0, y0, x1, y1)))
+                i = k
+        return pieces
+
+    def _get_refocus_image_ids_map(self):
+        """Return table of the closest refocus image id of each depth cell,
+        indexed like the depth look-up table
+        """
+        if self._refocus_image_ids_map is None:
+            depth_lut = self.get_refocus_stack().depth_lut
+            self._refocus_image_ids_map = [
+                    [ self.find_closest_refocus_image_by_lut_idx(i, j).id
+                        for j in range(depth_lut.height) ]
+                    for i in range(depth_lut.width) ]
+        return self._refocus_image_ids_map
+
+    def _get_depth_lut_data(self):
+        depth_lut = self.get_refocus_stack().depth_lut
+        if depth_lut.representation != 'raw':
+            raise LfpPictureError("%s: Unsupported depth look-up table representation: %s"
+                    % (self.file_path, depth_lut.representation))
+        return depth_lut.chunk.data
+
+    def get_pil_lambda_map(self, size=None, edge_aware=False):
+        """Return pil.Image ('F' mode) of lambda values, upsampled from the
+        depth look-up table to `size' (default: refocus image size)
+
+        With `edge_aware', depth edges are not blurred.  The last few sizes
+        are cached.
+        """
+        rstk = self.get_refocus_stack()
+        size = tuple(size) if size else (rstk.width, rstk.height)
+        key = (size, edge_aware)
+        lambda_map = self._lambda_map_cache.get(key)
+        if lambda_map is not None:
+            return lambda_map
+        with span('upsample_depth', size=size):
+            lambda_map = lfp_depth.upsample_depth(self._get_depth_lut_data(),
+                    rstk.depth_lut.width, rstk.depth_lut.height, size,
+                    self.LAMBDA_EDGE_THRESHOLD if edge_aware else None)
+        self._lambda_map_cache.put(key, lambda_map)
+        return lambda_map
+
+    def get_lambda_at(self, x_f=.5, y_f=.5, size=None, edge_aware=False):
+        """Return the lambda value of a point of the lambda map of `size'
+
+        Parameters `x_f' and `y_f' are floats in range [0, 1)
+        """
+        lambda_map = self.get_pil_lambda_map(size, edge_aware)
+        width, height = lambda_map.size
+        return lambda_map.getpixel((
+            max(0, min(int(x_f * width),  width - 1)),
+            max(0, min(int(y_f * height), height - 1))))
 
     def get_default_lambda(self):
         return self.get_refocus_stack().default_lambda
@@ -470,11 +860,8 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
         """Parameters `x_f' and `y_f' are floats in range [0, 1)
         """
         pstk = self.get_parallax_stack()
-        x_f = max(0, min(x_f, 1))
-        y_f = max(0, min(y_f, 1))
-        viewpoint_coord = Coord((x_f-.5) * pstk.viewpoint_width,
-                                (y_f-.5) * pstk.viewpoint_height)
-        closest_image, min_euclidean_dist = None, sys.maxint
+        viewpoint_coord = self._get_viewpoint_coord(x_f, y_f)
+        closest_image, min_euclidean_dist = None, float('inf')
         for id, pimg in dict_items(pstk.parallax_images):
             euclidean_dist = ( (pimg.coord.x-viewpoint_coord.x)**2
                              + (pimg.coord.y-viewpoint_coord.y)**2 )
@@ -482,3 +869,68 @@ class LfpPictureFile(lfp_file.LfpGenericFile):
                 closest_image, min_euclidean_dist = pimg, euclidean_dist
         return closest_image
 
+    def _get_viewpoint_coord(self, x_f, y_f):
+        pstk = self.get_parallax_stack()
+        x_f = max(0, min(x_f, 1))
+        y_f = max(0, min(y_f, 1))
+        return Coord((x_f-.5) * pstk.viewpoint_width,
+                     (y_f-.5) * pstk.viewpoint_height)
+
+    def find_surrounding_parallax_images(self, x_f=.5, y_f=.5):
+        """Return list of (parallax image, weight) of the three parallax
+        images closest to a viewpoint, with weights adding up to 1
+
+        Weights are barycentric when the viewpoint is in their triangle,
+        and inverse distances otherwise.  Parameters `x_f' and `y_f' are
+        floats in range [0, 1)
+        """
+        pstk = self.get_parallax_stack()
+        vc = self._get_viewpoint_coord(x_f, y_f)
+        pimgs = sorted(pstk.parallax_images.values(),
+                key=lambda pimg: (pimg.coord.x-vc.x)**2 + (pimg.coord.y-vc.y)**2)[:3]
+        if len(pimgs) == 3:
+            (x1, y1), (x2, y2), (x3, y3) = [ pimg.coord for pimg in pimgs ]
+            det = (y2-y3) * (x1-x3) + (x3-x2) * (y1-y3)
+            if math.fabs(det) > 1e-9:
+                w1 = ((y2-y3) * (vc.x-x3) + (x3-x2) * (vc.y-y3)) / det
+                w2 = ((y3-y1) * (vc.x-x3) + (x1-x3) * (vc.y-y3)) / det
+                weights = (w1, w2, 1 - w1 - w2)
+                if min(weights) >= 0:
+                    return list(zip(pimgs, weights))
+        dists = [ math.hypot(pimg.coord.x-vc.x, pimg.coord.y-vc.y) for pimg in pimgs ]
+        if dists[0] < 1e-9:
+            return [ (pimgs[0], 1.) ]
+        total = sum(1 / dist for dist in dists)
+        return [ (pimg, 1 / dist / total) for pimg, dist in zip(pimgs, dists) ]
+
+    def render_parallax_interpolated(self, x_f=.5, y_f=.5, size=None):
+        """Return pil.Image seen from a viewpoint, blended from the parallax
+        images around it, at `size' (default: image size)
+
+        Viewpoint is rounded to PARALLAX_VIEWPOINT_STEP.  The last few images
+        are cached.  Parameters `x_f' and `y_f' are floats in range [0, 1)
+        """
+        check_pil_module()
+        step = self.PARALLAX_VIEWPOINT_STEP
+        x_i = int(round(max(0, min(x_f, 1)) / step))
+        y_i = int(round(max(0, min(y_f, 1)) / step))
+        size = tuple(size) if size else None
+        key = (x_i, y_i, size)
+        pil_image = self._parallax_cache.get(key)
+        if pil_image is not None:
+            return pil_image
+        # Skip images hardly adding anything
+        weighted_pimgs = [ (pimg, weight) for pimg, weight in
+                self.find_surrounding_parallax_images(x_i * step, y_i * step)
+                if weight >= 1 / 256 ]
+        with span('render_parallax', viewpoint=(x_i * step, y_i * step), size=size):
+            pil_image, total = None, 0.
+            for pimg, weight in weighted_pimgs:
+                total += weight
+                next_image = self._get_resized_image('parallax', pimg.id, size)
+                if pil_image is None:
+                    pil_image = next_image
+                else:
+                    pil_image = pil.blend(pil_image, next_image, weight / total)
+        self._parallax_cache.put(key, pil_image)
+        return pil_image
@@ -29,8 +29,10 @@ from __future__ import division, print_function
 
 import struct
 import json
+import threading
 
-from .lfp_logging import log
+from .lfp_logging import log, span
+from .lfp_metrics import count
 
 
 ################################################################
@@ -58,8 +60,10 @@ class LfpSection:
     ################################
     # Internals
 
-    def __init__(self, file_):
+    def __init__(self, file_, lock=None):
         self._file = file_
+        # Serializes seek() and read() on a file shared between threads
+        self._lock = lock or threading.Lock()
         self.read()
 
     def __repr__(self):
@@ -74,13 +78,40 @@ class LfpSection:
     @property
     def sha1(self): return self._sha1
 
+    @property
+    def offset(self): return self._dpos
+
+    @property
+    def loaded_size(self):
+        """Size of data read into memory"""
+        return len(self._data) if self._data is not None else 0
+
     @property
     def data(self):
         if self._size > 0 and self._data is None:
-            self._file.seek(self._dpos, 0)
-            self._data = self._file.read(self._size)
+            with self._lock:
+                if self._data is None:
+                    self._file.seek(self._dpos, 0)
+                    self._data = self._file.read(self._size)
         return self._data
 
+    def iter_data(self, block_size=64*1024):
+        """Yield data in blocks, without keeping it in memory"""
+        if self._data is not None:
+            yield self._data
+            return
+        if not self._size > 0:
+            return
+        pos, end = self._dpos, self._dpos + self._size
+        while pos < end:
+            with self._lock:
+                self._file.seek(pos, 0)
+                block = self._file.read(min(block_size, end - pos))
+            if not block:
+                raise LfpReadError("Unexpected end of file for section %s!" % self.NAME)
+            pos += len(block)
+            yield block
+
     ################################
     # Loading
 
@@ -136,7 +167,11 @@ class LfpMeta(LfpSection):
     @property
     def content(self):
         if self._content is None:
-            self._content = json.loads(self.data.decode('ASCII'))
+            count(self._file, 'meta_content_misses')
+            with span('parse_meta', size=self._size):
+                self._content = json.loads(self.data.decode('ASCII'))
+        else:
+            count(self._file, 'meta_content_hits')
         return self._content
 
 class LfpChunk(LfpSection):
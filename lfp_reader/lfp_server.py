@@ -0,0 +1,457 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Serve images and data of LFP Picture files over HTTP
+
+Pictures are named by their path, relative to the served directory, without
+the `.lfp' extension.  Resources (GET or HEAD) are:
+
+- /pictures                         JSON list of picture names
+- /pictures/<name>                  JSON summary of the refocus and parallax stacks
+- /pictures/<name>/metadata         JSON metadata of the file
+- /pictures/<name>/depth            JSON depth look-up table, as rows of lambdas
+- /pictures/<name>/refocus          refocused image, at `?lambda=' (default: default lambda)
+- /pictures/<name>/refocus/<id>     refocus image
+- /pictures/<name>/parallax         image seen from viewpoint `?x=&y=' (default: center)
+- /pictures/<name>/parallax/<id>    parallax image
+- /pictures/<name>/all_focused      all-focused image
+
+Images are JPEG, or PNG with `?format=png', and are resized to fit in
+`?size=W' or `?size=WxH' on demand.  Requests are handled by a fixed pool of
+threads.  Pictures are opened on first request and shared by all threads,
+along with their decoded images; encoded responses are cached too.  ETags are
+derived from the SHA1 ids of the file sections, so unchanged resources are
+answered with `304 Not Modified', without decoding.
+"""
+
+
+from __future__ import division, print_function
+
+import os.path
+import sys
+import re
+import json
+import math
+import hashlib
+import threading
+import traceback
+
+from .lfp_logging import log, span
+from .lfp_file import LfpGenericError
+from .lfp_picture import LfpPictureFile
+from ._utils import BytesIO, LruCache, pil_antialias, check_pil_module, find_lfp_paths
+
+if sys.hexversion < 0x03000000:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urlparse import urlsplit, parse_qs
+    from urllib import unquote
+    from Queue import Queue
+else:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlsplit, parse_qs, unquote
+    from queue import Queue
+
+
+DEFAULT_ADDRESS = ('127.0.0.1', 8080)
+
+DEFAULT_THREADS = 8
+
+IMAGE_FORMATS = {
+        'jpeg': 'image/jpeg',
+        'png':  'image/png',
+        }
+
+
+class LfpServerError(Exception):
+    """HTTP error, with its status code"""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+################################################################
+# Pictures
+
+class _Picture:
+    """An opened LFP Picture file, with the lock serializing its use"""
+
+    def __init__(self, lfp_path):
+        self.lfp = LfpPictureFile(lfp_path).load()
+        # Calls on one picture share one file object
+        self.lock = threading.Lock()
+        sha1s = [ self.lfp.meta.sha1 ] + sorted(self.lfp.chunks)
+        self.digest = hashlib.sha1(' '.join(sha1s).encode('ASCII')).hexdigest()
+        self.closed = False
+
+    def close(self):
+        # Waits for the running call
+        with self.lock:
+            self.closed = True
+            self.lfp.close()
+
+
+def find_picture_names(lfp_paths):
+    """Return a dict of picture names to LFP file paths
+
+    Files of directories are named by their path relative to the directory,
+    other files by their base name.  Extensions are dropped.
+    """
+    names = {}
+    for path in lfp_paths:
+        root = path if os.path.isdir(path) else os.path.dirname(path)
+        for lfp_path in find_lfp_paths([path]):
+            name = os.path.splitext(os.path.relpath(lfp_path, root or '.'))[0]
+            name = name.replace(os.sep, '/')
+            if name in names:
+                log("Skip file: %s (duplicate name %s)" % (lfp_path, name))
+                continue
+            names[name] = lfp_path
+    return names
+
+
+def _fit_size(size, max_size):
+    """Return `size' scaled down to fit in `max_size', keeping its aspect"""
+    if not max_size:
+        return None
+    scale = min(1., max_size[0] / size[0], max_size[1] / size[1])
+    return (max(1, int(round(size[0] * scale))), max(1, int(round(size[1] * scale))))
+
+
+################################################################
+# Server
+
+class _ThreadPoolMixIn:
+    """Handle requests in a fixed pool of worker threads"""
+
+    def start_workers(self, threads):
+        self._requests = Queue()
+        self._workers = []
+        for i in range(threads):
+            worker = threading.Thread(target=self._work, name='lfp-server-%d' % i)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def process_request(self, request, client_address):
+        self._requests.put((request, client_address))
+
+    def _work(self):
+        while True:
+            request, client_address = self._requests.get()
+            if request is None:
+                return
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def stop_workers(self):
+        for worker in self._workers:
+            self._requests.put((None, None))
+        for worker in self._workers:
+            worker.join()
+
+
+class LfpHttpServer(_ThreadPoolMixIn, HTTPServer):
+    """HTTP server of LFP Picture files, see the module documentation
+
+    Use `serve_forever()' to run, and `server_close()' to stop the workers.
+    """
+
+    # Number of opened pictures kept in cache
+    PICTURE_CACHE_SIZE = 16
+    # Number of encoded responses kept in cache
+    RESPONSE_CACHE_SIZE = 256
+
+    def __init__(self, lfp_paths, address=DEFAULT_ADDRESS, threads=DEFAULT_THREADS):
+        check_pil_module()
+        HTTPServer.__init__(self, address, _LfpRequestHandler)
+        self.picture_paths = find_picture_names(lfp_paths)
+        self._pictures = LruCache(self.PICTURE_CACHE_SIZE,
+                lambda name, picture: picture.close())
+        self._pictures_lock = threading.Lock()
+        self._responses = LruCache(self.RESPONSE_CACHE_SIZE)
+        self.start_workers(threads)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return "http://%s:%d/" % (host, port)
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self.stop_workers()
+        for picture in self._pictures.values():
+            picture.close()
+        self._pictures.clear()
+
+    def get_picture(self, name):
+        """Return the opened `_Picture' of a name, opening it when needed"""
+        if name not in self.picture_paths:
+            raise LfpServerError(404, "Unknown picture: %s" % name)
+        picture = self._pictures.get(name)
+        if picture is None:
+            # Opened once, even if requested by many threads
+            with self._pictures_lock:
+                picture = self._pictures.get(name)
+                if picture is None:
+                    try:
+                        picture = _Picture(self.picture_paths[name])
+                    except (LfpGenericError, IOError, OSError) as err:
+                        raise LfpServerError(500, "Cannot open picture %s: %s" % (name, err))
+                    self._pictures.put(name, picture)
+        return picture
+
+    def get_response(self, path, query, etag_only=False):
+        """Return (content_type, etag, body) of a resource
+
+        Body is `None' with `etag_only', unless it was cached.
+        """
+        if path.rstrip('/') == '/pictures':
+            return 'application/json', None, _dump_json(sorted(self.picture_paths))
+        match = re.match(r'^/pictures/(?P<name>.+?)'
+                r'(?:/(?P<resource>metadata|depth|all_focused|refocus|parallax)'
+                r'(?:/(?P<image_id>\d+))?)?/?$', path)
+        if not match:
+            raise LfpServerError(404, "Unknown resource: %s" % path)
+        name, resource, image_id = match.group('name', 'resource', 'image_id')
+        image_id = int(image_id) if image_id else None
+        picture = self.get_picture(name)
+        # Errors are not hidden by revalidation
+        _check_request(picture.lfp, resource, image_id, query)
+        etag = '"%s"' % hashlib.sha1(('%s %s %s' % (picture.digest, path,
+            sorted((key, values[-1]) for key, values in query.items()))).encode('UTF-8')).hexdigest()
+        response = self._responses.get(etag)
+        if response is not None:
+            return response[0], etag, response[1]
+        if etag_only:
+            return None, etag, None
+        try:
+            with span('http_response', picture=name, resource=resource):
+                content_type, body = self._make_picture_response(
+                        name, resource, image_id, query)
+        except LfpServerError:
+            raise
+        except Exception as err:
+            # Answered, instead of dropping the connection
+            log(traceback.format_exc())
+            raise LfpServerError(500, "Cannot make %s of picture %s: %s" % (resource, name, err))
+        self._responses.put(etag, (content_type, body))
+        return content_type, etag, body
+
+    def _make_picture_response(self, name, resource, image_id, query):
+        while True:
+            picture = self.get_picture(name)
+            with picture.lock:
+                # Unless closed, when dropped from cache by another thread
+                if not picture.closed:
+                    return self._make_response(picture.lfp, resource, image_id, query)
+
+    def _make_response(self, lfp, resource, image_id, query):
+        if resource is None:
+            return 'application/json', _dump_json(_get_summary(lfp))
+        elif resource == 'metadata':
+            return 'application/json', _dump_json(lfp.meta.content)
+        elif resource == 'depth':
+            depth_lut = lfp.get_refocus_stack().depth_lut
+            return 'application/json', _dump_json(dict(
+                width=depth_lut.width,
+                height=depth_lut.height,
+                rows=[ [ depth_lut.table[x][y] for x in range(depth_lut.width) ]
+                    for y in range(depth_lut.height) ]))
+
+        # Images
+        image_format = _get_query(query, 'format', str, 'jpeg')
+        max_size = _get_query(query, 'size', _parse_size, None)
+        try:
+            pil_image = self._render_image(lfp, resource, image_id, query, max_size)
+        except RuntimeError as err:
+            # Missing GStreamer
+            raise LfpServerError(501, str(err))
+        output = BytesIO()
+        pil_image.save(output, image_format)
+        return IMAGE_FORMATS[image_format], output.getvalue()
+
+    def _render_image(self, lfp, resource, image_id, query, max_size):
+        if resource == 'refocus':
+            rstk = lfp.get_refocus_stack()
+            size = _fit_size((rstk.width, rstk.height), max_size)
+            if image_id is not None:
+                return self._get_stack_image(lfp, 'refocus', image_id, size)
+            lambda_ = _get_query(query, 'lambda', _parse_float, lfp.get_default_lambda())
+            # Images are the same beyond the stack range
+            lambda_ = max(lfp.get_min_lambda(), min(lambda_, lfp.get_max_lambda()))
+            return lfp.render_refocus_interpolated(lambda_, size)
+        elif resource == 'parallax':
+            pstk = lfp.get_parallax_stack()
+            size = _fit_size((pstk.width, pstk.height), max_size)
+            if image_id is not None:
+                return self._get_stack_image(lfp, 'parallax', image_id, size)
+            return lfp.render_parallax_interpolated(
+                    _get_query(query, 'x', _parse_float, .5), _get_query(query, 'y', _parse_float, .5), size)
+        else:
+            rstk = lfp.get_refocus_stack()
+            return lfp.render_all_focused(_fit_size((rstk.width, rstk.height), max_size))
+
+    def _get_stack_image(self, lfp, group, image_id, size):
+        pil_image = lfp.get_pil_image(group, image_id)
+        if size and size != pil_image.size:
+            pil_image = pil_image.resize(size, pil_antialias)
+        return pil_image
+
+
+class _LfpRequestHandler(BaseHTTPRequestHandler):
+
+    server_version = 'LfpReader'
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        url = urlsplit(self.path)
+        if_none_match = self.headers.get('If-None-Match')
+        try:
+            content_type, etag, body = self.server.get_response(
+                    unquote(url.path), parse_qs(url.query), etag_only=bool(if_none_match))
+            if etag and if_none_match in (etag, '*'):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            if body is None:
+                content_type, etag, body = self.server.get_response(
+                        unquote(url.path), parse_qs(url.query))
+        except LfpServerError as err:
+            content_type, etag, body = 'text/plain', None, str(err).encode('UTF-8')
+            self.send_response(err.status)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log("%s - %s" % (self.address_string(), format % args))
+
+
+################################################################
+# Helpers
+
+def _dump_json(data):
+    return json.dumps(data, indent=4, sort_keys=True).encode('UTF-8')
+
+
+def _get_query(query, key, parse, default):
+    if key not in query:
+        return default
+    try:
+        return parse(query[key][-1])
+    except ValueError:
+        raise LfpServerError(400, "Invalid parameter %s: %s" % (key, query[key][-1]))
+
+
+def _parse_float(value):
+    """Parse a finite float"""
+    value = float(value)
+    if math.isinf(value) or math.isnan(value):
+        raise ValueError(value)
+    return value
+
+
+def _parse_size(value):
+    """Parse `W' or `WxH' into (width, height)"""
+    size = tuple(int(v) for v in value.lower().split('x'))
+    if len(size) == 1:
+        size *= 2
+    if len(size) != 2 or min(size) < 1:
+        raise ValueError(value)
+    return size
+
+
+def _check_request(lfp, resource, image_id, query):
+    """Raise LfpServerError if a resource or its parameters are invalid"""
+    if resource in ('depth', 'refocus', 'all_focused') and not lfp.has_refocus_stack():
+        raise LfpServerError(404, "No refocus stack in picture")
+    if resource == 'parallax' and not lfp.has_parallax_stack():
+        raise LfpServerError(404, "No parallax stack in picture")
+    if image_id is not None:
+        if resource == 'refocus':
+            images = lfp.get_refocus_stack().refocus_images
+        elif resource == 'parallax':
+            images = lfp.get_parallax_stack().parallax_images
+        else:
+            images = {}
+        if image_id not in images:
+            raise LfpServerError(404, "Unknown %s image: %d" % (resource, image_id))
+    if resource in ('refocus', 'parallax', 'all_focused'):
+        image_format = _get_query(query, 'format', str, 'jpeg')
+        if image_format not in IMAGE_FORMATS:
+            raise LfpServerError(400, "Unsupported image format: %s" % image_format)
+        _get_query(query, 'size', _parse_size, None)
+        for key in ('lambda', 'x', 'y'):
+            _get_query(query, key, _parse_float, None)
+
+
+def _get_summary(lfp):
+    summary = dict(refocus=None, parallax=None)
+    if lfp.has_refocus_stack():
+        rstk = lfp.get_refocus_stack()
+        summary['refocus'] = dict(
+                width=rstk.width,
+                height=rstk.height,
+                default_lambda=rstk.default_lambda,
+                min_lambda=rstk.min_lambda,
+                max_lambda=rstk.max_lambda,
+                depth_lut=dict(width=rstk.depth_lut.width, height=rstk.depth_lut.height),
+                images=[ { 'id': rimg.id, 'lambda': rimg.lambda_ }
+                    for id, rimg in sorted(rstk.refocus_images.items()) ])
+    if lfp.has_parallax_stack():
+        pstk = lfp.get_parallax_stack()
+        summary['parallax'] = dict(
+                width=pstk.width,
+                height=pstk.height,
+                viewpoint_width=pstk.viewpoint_width,
+                viewpoint_height=pstk.viewpoint_height,
+                images=[ dict(id=pimg.id, x=pimg.coord.x, y=pimg.coord.y)
+                    for id, pimg in sorted(pstk.parallax_images.items()) ])
+    return summary
+
+
+def serve(lfp_paths, address=DEFAULT_ADDRESS, threads=DEFAULT_THREADS):
+    """Serve LFP Picture files and directories until interrupted"""
+    server = LfpHttpServer(lfp_paths, address, threads)
+    try:
+        log("Serve %d pictures on %s" % (len(server.picture_paths), server.url))
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -28,10 +28,12 @@
 from __future__ import division, print_function
 
 import sys
-from operator import itemgetter
+import bisect
+import fnmatch
+import re
 
 from . import lfp_file
-from ._utils import dict_items
+from .lfp_logging import span
 
 
 ################################################################
@@ -41,45 +43,136 @@ class LfpStorageError(lfp_file.LfpGenericError):
     """LFP Storage file error"""
 
 
-class LfpStorageFile(lfp_file.LfpGenericFile):
-    """Load an LFP Storage file and read the data chunks on-demand
+class LfpStoragePathIndex:
+    """Sorted index of the embedded file paths of an LFP Storage file
+
+    Supports lookups by exact path, by path prefix and by glob pattern
+    ('C:\\CALIB\\*'), only visiting the paths sharing the literal prefix of
+    the query.
     """
 
-    files = {}
+    _GLOB_SPECIAL_CHARS = re.compile(r'[*?[]')
 
-    @property
-    def files_sorted(self):
-        return sorted(dict_items(self.files), key=itemgetter(0))
+    def __init__(self, files_list, chunks):
+        try:
+            entries = sorted((f['name'], f['dataRef']) for f in files_list)
+            self._paths  = [ name for name, ref in entries ]
+            self._chunks = [ chunks[ref] for name, ref in entries ]
+        except KeyError:
+            raise LfpStorageError("Not a valid LFP Storage file")
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __contains__(self, emb_path):
+        return self._find(emb_path) is not None
+
+    def __getitem__(self, emb_path):
+        idx = self._find(emb_path)
+        if idx is None:
+            raise KeyError(emb_path)
+        return self._chunks[idx]
+
+    def _find(self, emb_path):
+        idx = bisect.bisect_left(self._paths, emb_path)
+        if idx < len(self._paths) and self._paths[idx] == emb_path:
+            return idx
+        return None
+
+    def items(self):
+        """Yield (path, chunk) pairs, sorted by path"""
+        return zip(self._paths, self._chunks)
+
+    def iter_prefix(self, prefix):
+        """Yield (path, chunk) pairs of paths starting with `prefix'"""
+        idx = bisect.bisect_left(self._paths, prefix)
+        while idx < len(self._paths) and self._paths[idx].startswith(prefix):
+            yield self._paths[idx], self._chunks[idx]
+            idx += 1
+
+    def iter_glob(self, pattern):
+        """Yield (path, chunk) pairs of paths matching a glob pattern"""
+        match = self._GLOB_SPECIAL_CHARS.search(pattern)
+        if match is None:
+            idx = self._find(pattern)
+            if idx is not None:
+                yield self._paths[idx], self._chunks[idx]
+            return
+        for emb_path, chunk in self.iter_prefix(pattern[:match.start()]):
+            if fnmatch.fnmatchcase(emb_path, pattern):
+                yield emb_path, chunk
 
 
+class LfpStorageFile(lfp_file.LfpGenericFile):
+    """Load an LFP Storage file and read the data chunks on-demand
+    """
+
     ################################
     # Internals
 
+    def __init__(self, file_):
+        lfp_file.LfpGenericFile.__init__(self, file_)
+        self._path_index = None
+
     def __repr__(self):
         return "LfpStorageFile(%s, %s, %d chunks)" % (self.header, self.meta, len(self.chunks))
 
+    @property
+    def files(self):
+        """Embedded files, as a mapping of paths to data chunks"""
+        if self._path_index is None:
+            with span('index_files'):
+                self._path_index = LfpStoragePathIndex(self.meta.content['files'], self.chunks)
+        return self._path_index
+
+    @property
+    def files_sorted(self):
+        return list(self.files.items())
+
 
     ################################
     # Loading
 
     def process(self):
-        try:
-            files_list = self.meta.content['files']
-            self.files = dict( (f['name'], self.chunks[f['dataRef']])
-                    for f in files_list )
-        except KeyError:
+        if not isinstance(self.meta.content.get('files'), list):
             raise LfpStorageError("Not a valid LFP Storage file")
 
 
+    ################################
+    # Accessing
+
+    def find_files(self, pattern):
+        """Yield (path, chunk) pairs of embedded files matching a glob pattern"""
+        return self.files.iter_glob(pattern)
+
+    def extract_many(self, patterns):
+        """Yield (path, data) pairs of embedded files matching glob patterns
+
+        Matching data chunks are read in file-offset order, in one forward
+        pass over the file.
+        """
+        emb_paths = {}
+        for pattern in patterns:
+            for emb_path, chunk in self.files.iter_glob(pattern):
+                emb_paths.setdefault(chunk, []).append(emb_path)
+        for chunk in sorted(emb_paths, key=lambda chunk: chunk.offset):
+            data = b''.join(chunk.iter_data())
+            for emb_path in sorted(set(emb_paths[chunk])):
+                yield emb_path, data
+
+
     ################################
     # Exporting
 
     def export(self):
         self.export_files()
 
-    def export_files(self):
-        for emb_path, chunk in self.files_sorted:
-            chunk.export_data(self.get_export_path(emb_path.replace('\\', '__').replace(':', '')))
+    def export_files(self, patterns=('*',)):
+        for emb_path, data in self.extract_many(patterns):
+            self.export_write(emb_path.replace('\\', '__').replace(':', ''), None, data)
 
 
     ################################
@@ -89,4 +182,3 @@ class LfpStorageFile(lfp_file.LfpGenericFile):
         file.write("    Files:\n")
         file.writelines("%12d\t%s\n" % (chunk.size, emb_path)
                 for emb_path, chunk in self.files_sorted)
-
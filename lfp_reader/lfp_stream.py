@@ -0,0 +1,205 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Read sections of a LFP stream in one forward pass
+
+Unlike `LfpGenericFile', the stream reader never seeks, so it works on pipes,
+sockets and standard input.  Sections are yielded as soon as their headers
+arrive, and the payload of each section can be consumed block by block before
+moving on to the next one.
+"""
+
+
+from __future__ import division, print_function
+
+import struct
+import json
+import hashlib
+
+from .lfp_section import LfpReadError, LfpSection, LfpHeader, LfpMeta, LfpChunk
+
+
+################################################################
+# Sections
+
+class LfpStreamSection:
+    """LFP stream section, with payload available only until the next section
+    """
+
+    def __init__(self, reader, section_class, size, sha1):
+        self._reader = reader
+        self._section_class = section_class
+        self._size = size
+        self._sha1 = sha1
+        self._remaining = size
+        self._sha1_hash = hashlib.sha1() if reader.verify else None
+        self._data = None
+        self._content = None
+
+    def __repr__(self):
+        if self._size > 0:
+            return "%s(%sB)" % (self.NAME, self._size)
+        else:
+            return "%s()" % (self.NAME)
+
+    @property
+    def NAME(self): return self._section_class.NAME
+
+    @property
+    def section_class(self): return self._section_class
+
+    @property
+    def size(self): return self._size
+
+    @property
+    def sha1(self): return self._sha1
+
+    @property
+    def is_consumed(self): return self._remaining == 0
+
+    @property
+    def data(self):
+        """Read and keep the whole payload in memory"""
+        if self._data is None and self._size > 0:
+            if self._remaining != self._size:
+                raise LfpReadError("Data of section %s is already partially consumed!" % self.NAME)
+            self._data = b''.join(self.iter_data())
+        return self._data
+
+    @property
+    def content(self):
+        """Parsed JSON payload, for metadata sections"""
+        if self._content is None:
+            self._content = json.loads(self.data.decode('ASCII'))
+        return self._content
+
+    def iter_data(self, block_size=None):
+        """Yield the payload in blocks of at most `block_size' bytes"""
+        if self._data is not None:
+            yield self._data
+            return
+        block_size = block_size or self._reader.block_size
+        while self._remaining > 0:
+            block = self._reader._read_payload(min(block_size, self._remaining))
+            self._remaining -= len(block)
+            if self._sha1_hash:
+                self._sha1_hash.update(block)
+            if self._remaining == 0:
+                self._verify()
+            yield block
+
+    def skip(self):
+        """Consume the rest of the payload without keeping it"""
+        for block in self.iter_data():
+            pass
+
+    def _verify(self):
+        if self._sha1_hash and self._sha1 != "sha1-" + self._sha1_hash.hexdigest():
+            raise LfpReadError("Invalid SHA1 for section %s: %s" % (self.NAME, self._sha1))
+
+
+################################################################
+# Reader
+
+class LfpStreamReader:
+    """Read a LFP file from a non-seekable stream, section by section
+
+    Iterating over the reader yields a `LfpStreamSection' for the header, the
+    metadata and then every data chunk.  The payload of a section not consumed
+    by the caller is skipped when the next section is requested.
+    """
+
+    DEFAULT_BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, file_, block_size=DEFAULT_BLOCK_SIZE, verify=True):
+        self._file = file_
+        self._buffer = b''
+        self._current = None
+        self.block_size = block_size
+        self.verify = verify
+
+    def __iter__(self):
+        return self.sections()
+
+    def sections(self):
+        yield self._read_section(LfpHeader)
+        yield self._read_section(LfpMeta)
+        while self._skip_padding():
+            yield self._read_section(LfpChunk)
+
+    ################################
+    # Internals
+
+    def _read(self, size):
+        """Read up to `size' bytes, buffered bytes first"""
+        if self._buffer:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+            return data
+        return self._file.read(size)
+
+    def _read_exact(self, size):
+        data = b''
+        while len(data) < size:
+            block = self._read(size - len(data))
+            if not block:
+                raise LfpReadError("Unexpected end of LFP stream")
+            data += block
+        return data
+
+    def _read_payload(self, size):
+        block = self._read(size)
+        if not block:
+            raise LfpReadError("Unexpected end of LFP stream")
+        return block
+
+    def _skip_padding(self):
+        """Skip null chars between sections, return False at end of stream"""
+        if self._current is not None:
+            self._current.skip()
+        while True:
+            if not self._buffer:
+                self._buffer = self._file.read(self.block_size)
+                if not self._buffer:
+                    return False
+            self._buffer = self._buffer.lstrip(b'\0')
+            if self._buffer:
+                return True
+
+    def _read_section(self, section_class):
+        self._skip_padding()
+        # Read and check magic
+        magic = self._read_exact(LfpSection.MAGIC_LENGTH)
+        if magic != section_class.MAGIC:
+            raise LfpReadError("Invalid magic bytes for section %s!" % section_class.NAME)
+        # Read size
+        size = struct.unpack(">i", self._read_exact(LfpSection.SIZE_LENGTH))[0]
+        sha1 = None
+        if size > 0:
+            # Read sha1
+            sha1 = str(self._read_exact(LfpSection.SHA1_LENGTH).decode('ASCII'))
+            # Skip fixed null chars
+            self._read_exact(LfpSection.PADDING_LENGTH)
+        else:
+            size = 0
+        self._current = LfpStreamSection(self, section_class, size, sha1)
+        return self._current
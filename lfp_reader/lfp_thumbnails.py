@@ -0,0 +1,168 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Make thumbnails and contact sheets of many LFP Picture files
+
+Only the default view of each file is decoded, at reduced resolution, and
+files are read in a pool of worker processes.
+"""
+
+
+from __future__ import division, print_function
+
+import os, os.path
+import multiprocessing
+
+from .lfp_logging import log
+from .lfp_file import LfpGenericError
+from .lfp_picture import LfpPictureFile
+from ._utils import pil, find_lfp_paths
+
+
+DEFAULT_SIZE = (256, 256)
+
+# Height of file name labels in contact sheets
+LABEL_HEIGHT = 14
+
+
+def get_thumbnail_path(lfp_path, output_dir=None, image_format='jpeg'):
+    prefix, lfp_ext = os.path.splitext(lfp_path)
+    if lfp_ext != '.lfp':
+        prefix = lfp_path
+    if output_dir is not None:
+        prefix = os.path.join(output_dir, os.path.basename(prefix))
+    return "%s__thumbnail.%s" % (prefix, image_format)
+
+
+################################################################
+# Workers
+
+def _read_thumbnail(args):
+    lfp_path, size = args
+    try:
+        lfp = LfpPictureFile(lfp_path).load()
+        try:
+            return lfp_path, lfp.get_pil_thumbnail(size), None
+        finally:
+            lfp.close()
+    except (LfpGenericError, IOError, OSError, RuntimeError) as err:
+        return lfp_path, None, str(err)
+
+
+def _write_thumbnail(args):
+    lfp_path, size, output_dir, image_format = args
+    lfp_path, pil_image, error = _read_thumbnail((lfp_path, size))
+    if pil_image is None:
+        return lfp_path, None, error
+    thumbnail_path = get_thumbnail_path(lfp_path, output_dir, image_format)
+    pil_image.save(thumbnail_path, image_format)
+    return lfp_path, thumbnail_path, None
+
+
+def _map(func, items, jobs=None):
+    """Yield results of `func' on items, in order, using a process pool"""
+    if jobs == 1 or len(items) < 2:
+        for item in items:
+            yield func(item)
+        return
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for result in pool.imap(func, items, chunksize=4):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+################################################################
+# Thumbnails
+
+def iter_thumbnails(lfp_paths, size=DEFAULT_SIZE, jobs=None):
+    """Yield (path, pil.Image) of LFP Picture files, in order
+
+    Files which cannot be read are logged and skipped.
+    """
+    items = [ (lfp_path, tuple(size)) for lfp_path in find_lfp_paths(lfp_paths) ]
+    for lfp_path, pil_image, error in _map(_read_thumbnail, items, jobs):
+        if pil_image is None:
+            log("Skip file: %s (%s)" % (lfp_path, error))
+            continue
+        yield lfp_path, pil_image
+
+
+def write_thumbnails(lfp_paths, size=DEFAULT_SIZE, output_dir=None,
+        image_format='jpeg', jobs=None):
+    """Write a thumbnail file next to each LFP Picture file (or in
+    `output_dir'), return the paths of written files
+    """
+    items = [ (lfp_path, tuple(size), output_dir, image_format)
+            for lfp_path in find_lfp_paths(lfp_paths) ]
+    thumbnail_paths = []
+    for lfp_path, thumbnail_path, error in _map(_write_thumbnail, items, jobs):
+        if thumbnail_path is None:
+            log("Skip file: %s (%s)" % (lfp_path, error))
+            continue
+        log("Create file: %s" % thumbnail_path)
+        thumbnail_paths.append(thumbnail_path)
+    return thumbnail_paths
+
+
+def write_contact_sheets(lfp_paths, sheet_prefix, size=DEFAULT_SIZE,
+        columns=8, rows=8, labels=True, image_format='jpeg', jobs=None):
+    """Write thumbnails of LFP Picture files tiled into contact sheets
+
+    Sheets are named `<sheet_prefix>_001.jpeg', ... and hold up to `columns'
+    x `rows' thumbnails, each labeled with its file name.  Return the paths
+    of written sheets.
+    """
+    from PIL import ImageDraw
+    cell_width, cell_height = size[0], size[1] + (LABEL_HEIGHT if labels else 0)
+    sheet_paths = []
+    sheet, count = None, 0
+    for lfp_path, pil_image in iter_thumbnails(lfp_paths, size, jobs):
+        if sheet is None:
+            sheet = pil.new('RGB', (columns * cell_width, rows * cell_height), 'black')
+            draw = ImageDraw.Draw(sheet)
+        x = (count % columns) * cell_width
+        y = (count // columns) * cell_height
+        sheet.paste(pil_image, (x + (size[0] - pil_image.size[0]) // 2,
+                                y + (size[1] - pil_image.size[1]) // 2))
+        if labels:
+            draw.text((x + 2, y + size[1] + 1), os.path.basename(lfp_path), fill='white')
+        count += 1
+        if count == columns * rows:
+            sheet_paths.append(_save_sheet(sheet, sheet_prefix, len(sheet_paths), image_format))
+            sheet, count = None, 0
+    if sheet is not None:
+        used_rows = (count + columns - 1) // columns
+        sheet = sheet.crop((0, 0, sheet.size[0], used_rows * cell_height))
+        sheet_paths.append(_save_sheet(sheet, sheet_prefix, len(sheet_paths), image_format))
+    return sheet_paths
+
+
+def _save_sheet(sheet, sheet_prefix, index, image_format):
+    sheet_path = "%s_%03d.%s" % (sheet_prefix, index + 1, image_format)
+    log("Create file: %s" % sheet_path)
+    sheet.save(sheet_path, image_format)
+    return sheet_path
@@ -0,0 +1,195 @@
+# python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Write LFP files section by section
+
+Sections are written in the same layout as read by `LfpSection': magic bytes,
+big-endian size, `sha1-' id, null padding, data and null padding up to a
+16-byte boundary.  Data is streamed in blocks and its SHA1 is computed on the
+way, so files of any size are written with constant memory.
+"""
+
+
+from __future__ import division, print_function
+
+import struct
+import json
+import hashlib
+import tempfile
+
+from .lfp_logging import log
+from .lfp_section import LfpSection, LfpHeader, LfpMeta, LfpChunk
+from ._utils import dict_items
+
+
+class LfpWriterError(Exception):
+    """LFP file writing error"""
+
+
+class LfpWriter:
+    """Write an LFP file, given a path or a file object
+
+    Sections shall be written in order: header, metadata and then data chunks.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+    ALIGNMENT = 16
+
+    def __init__(self, file_):
+        if isinstance(file_, (str)):
+            self._file_path = file_
+            self._file = open(file_, 'wb')
+            self._own_file = True
+        else:
+            self._file_path = getattr(file_, 'name', None)
+            self._file = file_
+            self._own_file = False
+        self._pos = 0
+
+    def __repr__(self):
+        return "LfpWriter(%s)" % self._file_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._file is None:
+            return
+        if self._own_file:
+            self._file.close()
+        else:
+            self._file.flush()
+        self._file = None
+
+    ################################
+    # Sections
+
+    def write_header(self):
+        self._write(LfpHeader.MAGIC + struct.pack(">i", 0))
+
+    def write_meta(self, content):
+        """Write metadata, given as a JSON-compatible dict or encoded bytes"""
+        if isinstance(content, dict):
+            content = json.dumps(content, indent=4, sort_keys=True).encode('ASCII')
+        return self.write_section(LfpMeta, [content], len(content))
+
+    def write_chunk(self, data):
+        """Write a data chunk, given as bytes, and return its sha1 id"""
+        return self.write_section(LfpChunk, [data], len(data))
+
+    def write_section(self, section_class, blocks, size=None, sha1=None):
+        """Write a section from an iterable of data blocks, return its sha1 id
+
+        With both `size' and `sha1' given, blocks are streamed right away and
+        checked against the `sha1' at the end.  Otherwise, the section header
+        is completed after the data, by seeking back on seekable outputs or by
+        spooling data into a temporary file.
+        """
+        if size is not None and sha1 is not None:
+            self._write_section_header(section_class, size, sha1)
+            written_size, written_sha1 = self._write_blocks(blocks)
+            if (written_size, written_sha1) != (size, sha1):
+                raise LfpWriterError("Data does not match size/sha1 of section %s: %s" % (section_class.NAME, sha1))
+        elif self._is_seekable():
+            header_pos = self._file.tell()
+            self._write_section_header(section_class, 0, "sha1-" + "0" * 40)
+            size, sha1 = self._write_blocks(blocks)
+            end_pos = self._file.tell()
+            self._file.seek(header_pos, 0)
+            self._write_section_header(section_class, size, sha1, count=False)
+            self._file.seek(end_pos, 0)
+        else:
+            with tempfile.SpooledTemporaryFile(max_size=16 * self.BLOCK_SIZE) as spool:
+                sha1_hash = hashlib.sha1()
+                size = 0
+                for block in blocks:
+                    sha1_hash.update(block)
+                    spool.write(block)
+                    size += len(block)
+                spool.seek(0)
+                return self.write_section(section_class,
+                        iter(lambda: spool.read(self.BLOCK_SIZE), b''),
+                        size, "sha1-" + sha1_hash.hexdigest())
+        self._write_padding()
+        return sha1
+
+    ################################
+    # Internals
+
+    def _is_seekable(self):
+        try:
+            self._file.tell()
+            return getattr(self._file, 'seekable', lambda: True)()
+        except (IOError, OSError, AttributeError):
+            return False
+
+    def _write(self, data, count=True):
+        self._file.write(data)
+        if count:
+            self._pos += len(data)
+
+    def _write_section_header(self, section_class, size, sha1, count=True):
+        sha1 = sha1.encode('ASCII')
+        if len(sha1) != LfpSection.SHA1_LENGTH:
+            raise LfpWriterError("Invalid SHA1 id for section %s: %s" % (section_class.NAME, sha1))
+        self._write(section_class.MAGIC + struct.pack(">i", size) + sha1
+                + b'\0' * LfpSection.PADDING_LENGTH, count)
+
+    def _write_blocks(self, blocks):
+        sha1_hash = hashlib.sha1()
+        size = 0
+        for block in blocks:
+            sha1_hash.update(block)
+            self._write(block)
+            size += len(block)
+        return size, "sha1-" + sha1_hash.hexdigest()
+
+    def _write_padding(self):
+        if self._pos % self.ALIGNMENT:
+            self._write(b'\0' * (self.ALIGNMENT - self._pos % self.ALIGNMENT))
+
+    ################################
+    # Copying
+
+    def copy_file(self, lfp, exclude_sha1s=(), meta_content=None):
+        """Write all sections of a loaded LFP file, except excluded chunks
+
+        Chunks are copied in their original order, in blocks, and verified
+        against their sha1 ids.  Return the number of copied chunks.
+        """
+        self.write_header()
+        if meta_content is None:
+            self.write_section(LfpMeta, lfp.meta.iter_data(self.BLOCK_SIZE),
+                    lfp.meta.size, lfp.meta.sha1)
+        else:
+            self.write_meta(meta_content)
+        chunks = sorted((chunk for sha1, chunk in dict_items(lfp.chunks)
+            if sha1 not in exclude_sha1s), key=lambda chunk: chunk.offset)
+        for chunk in chunks:
+            self.write_section(LfpChunk, chunk.iter_data(self.BLOCK_SIZE),
+                    chunk.size, chunk.sha1)
+        log("Create file: %s" % self._file_path)
+        return len(chunks)
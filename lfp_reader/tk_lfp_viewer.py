@@ -30,12 +30,14 @@ from __future__ import division, print_function
 import sys
 import os.path
 import re
+import threading
 import webbrowser
+from collections import OrderedDict
 
 from .lfp_picture import LfpPictureFile
 from .lfp_logging import log
 from ._utils import (
-        pil, piltk, check_pil_module,
+        pil, piltk, pil_antialias, check_pil_module,
         tk, tkFileDialog )
 
 
@@ -46,18 +48,35 @@ class TkLfpViewer(tk.Tk):
     """View and refocues Processed LFP Picture files
     """
 
+    # Time without resizing before redrawing in full quality, in milliseconds
+    RESIZE_SETTLE_DELAY = 200
+    # Memory used by open pictures before closing the least recently shown
+    # ones, in bytes
+    PICTURE_CACHE_BUDGET = 512 * 2**20
+
     def __init__(self,
             lfp_paths=None,
             title_pattern="{file_path}   ({index}/{count})   Python LFP Reader",
             init_size=(540, 540),
+            cache_budget=None,
             *args, **kwargs):
 
         check_pil_module()
         self._title_pattern = title_pattern
-        self._lfp_picture_cache = {}
+        self._cache_budget = cache_budget or self.PICTURE_CACHE_BUDGET
+        # Least recently shown first
+        self._lfp_picture_cache = OrderedDict()
         self._lfp = None
         self._active_size = None
         self._active_pil_image = None
+        self._active_tkp_image = None
+        self._active_group = None
+        self._pending_size = None
+        self._resize_timer = None
+        self._pending_motion = None
+        self._preload_generation = 0
+        # (picture, thread) of preloadings, maybe still running
+        self._preload_threads = []
         self._active_refocus_lambda = None
         self._active_parallax_viewp = (.5, .5)
 
@@ -117,8 +136,11 @@ class TkLfpViewer(tk.Tk):
         self.set_lfp_paths(lfp_paths)
 
     def _cb_config(self, event=None):
+        # Also received for child widgets
+        if event.widget is not self:
+            return
         new_size = (min(event.width, event.height), )*2
-        self.set_active_size(new_size)
+        self.schedule_active_size(new_size)
 
     def _cb_quit(self, event=None):
         self.quit()
@@ -234,11 +256,30 @@ class TkLfpViewer(tk.Tk):
         if lfp_path not in self._lfp_picture_cache:
             new_lfp = LfpPictureFile(lfp_path)
             new_lfp.load()
-            self.update()
-            new_lfp.preload_pil_images()
             self._lfp_picture_cache[lfp_path] = new_lfp
+        else:
+            self._lfp_picture_cache[lfp_path] = self._lfp_picture_cache.pop(lfp_path)
         return self._lfp_picture_cache[lfp_path]
 
+    def _evict_lfp_pictures(self, lfp_id):
+        """Close the least recently shown pictures while over the memory
+        budget, keeping the active picture and its neighbors
+        """
+        kept_paths = set(self._lfp_paths[i] for i in (lfp_id - 1, lfp_id, lfp_id + 1)
+                if 0 <= i < len(self._lfp_paths))
+        sizes = dict((lfp_path, lfp.get_memory_size())
+                for lfp_path, lfp in self._lfp_picture_cache.items())
+        total_size = sum(sizes.values())
+        for lfp_path in list(self._lfp_picture_cache):
+            if total_size <= self._cache_budget:
+                break
+            if lfp_path in kept_paths:
+                continue
+            lfp = self._lfp_picture_cache.pop(lfp_path)
+            self._join_preloading(lfp)
+            lfp.close()
+            total_size -= sizes[lfp_path]
+
     def set_lfp_path(self, lfp_id):
         lfp_path = self._lfp_paths[lfp_id]
         self.set_title(
@@ -249,19 +290,29 @@ class TkLfpViewer(tk.Tk):
         self._start_loading()
         self.update()
         self._lfp = self._get_lfp_picture(lfp_path)
-        self._end_loading()
 
-        # Verify and init view
-        if self._lfp.has_refocus_stack():
-            self.show_refocus()
-        elif self._lfp.has_parallax_stack():
-            self.show_parallax()
-        else:
+        # Verify and show the default image at once, from a single decoding
+        if not self._lfp.has_refocus_stack() and not self._lfp.has_parallax_stack():
             raise Exception("Unsupported LFP Picture file")
         '''
         elif self._lfp.has_frame():
             #todo Processing raw data!
         '''
+        self._active_group = None
+        self.set_active_pil_image(self._lfp.get_pil_thumbnail(self._active_size))
+        self._end_loading()
+        self.update_idletasks()
+
+        # Resize the other images in background, and init view when idle
+        self._start_preloading()
+        self.after_idle(self._show_default_view)
+        self._evict_lfp_pictures(lfp_id)
+
+    def _show_default_view(self):
+        if self._lfp.has_refocus_stack():
+            self.show_refocus()
+        else:
+            self.show_parallax()
 
     def next_lfp(self, event=None):
         self.set_active_lfp(self._active_lfp_id + 1)
@@ -279,14 +330,46 @@ class TkLfpViewer(tk.Tk):
     ################################
     # Size
 
+    def schedule_active_size(self, size):
+        """Show a fast preview at `size' at once, and set the active size
+        once resizing settles
+        """
+        if size == (self._pending_size or self._active_size):
+            return
+        self._pending_size = size
+        self._show_preview(size)
+        if self._resize_timer is not None:
+            self.after_cancel(self._resize_timer)
+        self._resize_timer = self.after(self.RESIZE_SETTLE_DELAY, self._cb_resize_settled)
+
+    def _cb_resize_settled(self):
+        self._resize_timer = None
+        size, self._pending_size = self._pending_size, None
+        self.set_active_size(size)
+
+    def _show_preview(self, size):
+        if not self._active_pil_image:
+            return
+        self._set_tkp_image(piltk.PhotoImage(self._active_pil_image.resize(size, pil.NEAREST)))
+
     def set_active_size(self, size):
         if size == self._active_size:
+            self._redraw_active_image()
             return
         self._active_size = size
         self._reset_image_caches()
         self._start_loading()
-        self._redraw_active_image()
+        # Interpolated images are rendered at the active size
+        if self._active_group == 'refocus':
+            self.show_refocus_lambda(self._active_refocus_lambda)
+        elif self._active_group == 'parallax':
+            self.show_parallax_at(*self._active_parallax_viewp)
+        elif self._active_group == 'all_focused':
+            self.show_all_focused()
+        else:
+            self._redraw_active_image()
         self._end_loading()
+        self._start_preloading()
 
 
     ################################
@@ -294,6 +377,7 @@ class TkLfpViewer(tk.Tk):
 
     def set_active_image(self, group, image_id):
         pil_image = self._lfp.get_pil_image(group, image_id)
+        self._active_group = group
         self.set_active_pil_image(pil_image)
 
     def set_active_pil_image(self, pil_image=None):
@@ -305,9 +389,39 @@ class TkLfpViewer(tk.Tk):
     def _redraw_active_image(self):
         if not self._active_pil_image:
             return
-        tkp_image = self._get_resized_tkp_image(self._active_pil_image)
+        if self._active_pil_image.size == self._active_size:
+            # Rendered for the active size, not worth caching
+            tkp_image = piltk.PhotoImage(self._active_pil_image)
+        else:
+            tkp_image = self._get_resized_tkp_image(self._active_pil_image)
+        self._set_tkp_image(tkp_image)
+
+    def _set_tkp_image(self, tkp_image):
+        # Tk does not keep a reference to the image
+        self._active_tkp_image = tkp_image
         self._pic.config(image=tkp_image)
 
+    def _get_event_position(self, event):
+        """Return event position relative to the shown image size"""
+        if self._active_tkp_image:
+            width, height = self._active_tkp_image.width(), self._active_tkp_image.height()
+        else:
+            width, height = self._active_size
+        return event.x / width, event.y / height
+
+    def _schedule_motion(self, func, *args):
+        """Call `func' when idle, only with the arguments of the last call
+        before that, coalescing bursts of motion events
+        """
+        if self._pending_motion is None:
+            self.after_idle(self._cb_motion_idle)
+        self._pending_motion = (func, args)
+
+    def _cb_motion_idle(self):
+        func, args = self._pending_motion
+        self._pending_motion = None
+        func(*args)
+
     def export_active_image(self, exp_path=None, exp_format='jpeg'):
         if not exp_path:
             exp_i = 0
@@ -330,6 +444,38 @@ class TkLfpViewer(tk.Tk):
         self.export_active_image(exp_path)
 
 
+    ################################
+    # Background Resizing
+
+    def _start_preloading(self):
+        """Resize stack images to the active size in a background thread,
+        the closest ones to the shown image first
+        """
+        self._preload_generation += 1
+        if not self._lfp:
+            return
+        generation = self._preload_generation
+        thread = threading.Thread(
+                target=self._lfp.preload_resized_images,
+                args=(self._get_preload_order(), self._active_size,
+                    lambda: generation != self._preload_generation))
+        thread.daemon = True
+        thread.start()
+        self._preload_threads = [ (lfp, t) for lfp, t in self._preload_threads if t.is_alive() ]
+        self._preload_threads.append((self._lfp, thread))
+
+    def _join_preloading(self, lfp):
+        """Wait for the cancelled preloadings of a picture, before closing it"""
+        for preload_lfp, thread in self._preload_threads:
+            if preload_lfp is lfp:
+                thread.join()
+
+    def _get_preload_order(self):
+        return self._lfp.get_preload_order(
+                self._active_refocus_lambda, self._active_parallax_viewp,
+                'parallax' if self._active_group == 'parallax' else 'refocus')
+
+
     ################################
     # pil.Image/tk.PhotoImage Caches
 
@@ -345,7 +491,7 @@ class TkLfpViewer(tk.Tk):
 
     def _get_resized_pil_image(self, pil_image):
         if pil_image not in self._resized_pil_cache:
-            self._resized_pil_cache[pil_image] = pil_image.resize(self._active_size, pil.ANTIALIAS)
+            self._resized_pil_cache[pil_image] = pil_image.resize(self._active_size, pil_antialias)
         return self._resized_pil_cache[pil_image]
 
 
@@ -360,22 +506,20 @@ class TkLfpViewer(tk.Tk):
     def show_refocus_at(self, x_f, y_f):
         if not self._lfp or not self._lfp.has_refocus_stack():
             return
-        closest_refocus = self._lfp.find_closest_refocus_image(x_f, y_f)
-        self._active_refocus_lambda = closest_refocus.lambda_
-        self.set_active_image('refocus', closest_refocus.id)
+        lambda_ = self._lfp.get_lambda_at(x_f, y_f, self._active_size, edge_aware=True)
+        self.show_refocus_lambda(lambda_)
 
     def _ms_refocus_at(self, event=None):
-        self.show_refocus_at(
-                event.x / self._active_size[0],
-                event.y / self._active_size[1])
+        self._schedule_motion(self.show_refocus_at, *self._get_event_position(event))
 
     def show_refocus_lambda(self, lambda_):
         if not self._lfp or not self._lfp.has_refocus_stack():
             return
         lambda_ = max(self._lfp.get_min_lambda(), min(lambda_, self._lfp.get_max_lambda()))
-        closest_refocus = self._lfp.find_closest_refocus_image_by_lambda(lambda_)
+        pil_image = self._lfp.render_refocus_interpolated(lambda_, self._active_size)
         self._active_refocus_lambda = lambda_
-        self.set_active_image('refocus', closest_refocus.id)
+        self._active_group = 'refocus'
+        self.set_active_pil_image(pil_image)
 
     def _cb_refocus_farther(self, event=None):
         new_lambda = self._active_refocus_lambda + .5
@@ -392,7 +536,8 @@ class TkLfpViewer(tk.Tk):
     def show_all_focused(self):
         if not self._lfp or not self._lfp.has_refocus_stack():
             return
-        self.set_active_image('all_focused', None)
+        self._active_group = 'all_focused'
+        self.set_active_pil_image(self._lfp.render_all_focused(self._active_size))
 
     def _cb_all_focused(self, event=None):
         self.show_all_focused()
@@ -411,14 +556,13 @@ class TkLfpViewer(tk.Tk):
             return
         x_f = max(0, min(x_f, 1))
         y_f = max(0, min(y_f, 1))
-        closest_parallax = self._lfp.find_closest_parallax_image(x_f, y_f)
+        pil_image = self._lfp.render_parallax_interpolated(x_f, y_f, self._active_size)
         self._active_parallax_viewp = (x_f, y_f)
-        self.set_active_image('parallax', closest_parallax.id)
+        self._active_group = 'parallax'
+        self.set_active_pil_image(pil_image)
 
     def _ms_parallax_at(self, event=None):
-        self.show_parallax_at(
-                event.x / self._active_size[0],
-                event.y / self._active_size[1])
+        self._schedule_motion(self.show_parallax_at, *self._get_event_position(event))
 
     def _cb_parallax_left(self, event=None):
         vp = self._active_parallax_viewp
@@ -54,6 +54,7 @@ setup(name="lfp-reader", version=release_version,
             ],
 
         scripts=[
+            'lfp-catalog.py',
             'lfp-file.py',
             'lfp-picture.py',
             'lfp-storage.py',
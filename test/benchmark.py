@@ -0,0 +1,637 @@
+#!/usr/bin/env python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Time the read, decode and render hot paths of lfp_reader
+
+Each benchmark is run on each LFP file, with a fresh setup for every repeat,
+and results are written as JSON to be compared across commits.
+"""
+
+
+from __future__ import division, print_function
+
+import os, os.path
+import sys
+import math
+import time
+import json
+import glob
+import shutil
+import platform
+import argparse
+import contextlib
+import tempfile
+import subprocess
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TEST_DIR))
+
+from lfp_reader import LfpGenericFile, LfpPictureFile, LfpPictureError, LfpStreamReader
+from lfp_reader import LfpStorageFile, LfpStorageError, lfp_picture, lfp_depth, lfp_server, _utils
+from lfp_reader.lfp_archive import LfpArchiveWriter
+from lfp_reader.lfp_chunk_store import LfpChunkStore
+
+import lfp_synth
+
+
+DEBUG = False
+QUIET = False
+
+SAMPLE_DIR = os.path.join(os.path.dirname(TEST_DIR), 'samples')
+RESULTS_VERSION = 1
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+################################################################
+# Registry
+
+class SkipBenchmark(Exception):
+    """Benchmark does not apply to the given file"""
+
+
+BENCHMARKS = []
+
+def benchmark(name):
+    """Register a benchmark
+
+    The decorated function gets an LFP file path, prepares the state (not
+    timed) and returns the callable to be timed.
+    """
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return decorator
+
+
+def _load_picture(lfp_path):
+    try:
+        return LfpPictureFile(lfp_path).load()
+    except RuntimeError as err:
+        # Missing GStreamer or PIL
+        raise SkipBenchmark(str(err))
+    except LfpPictureError as err:
+        raise SkipBenchmark(str(err))
+
+def _load_storage(lfp_path):
+    try:
+        return LfpStorageFile(lfp_path).load()
+    except LfpStorageError as err:
+        raise SkipBenchmark(str(err))
+
+def _require_refocus_stack(lfp):
+    if not lfp.has_refocus_stack():
+        raise SkipBenchmark("No refocus stack")
+
+def _require_parallax_stack(lfp):
+    if not lfp.has_parallax_stack():
+        raise SkipBenchmark("No parallax stack")
+
+def _require_pil():
+    if _utils.pil is None:
+        raise SkipBenchmark("Cannot find Python Imaging Library")
+
+def _h264_blocks(lfp_path):
+    lfp = LfpGenericFile(lfp_path).load()
+    blocks = []
+    for accel_data in lfp.meta.content.get('picture', {}).get('accelerationArray', []):
+        block_of_images = accel_data['vendorContent'].get('blockOfImages')
+        if block_of_images and block_of_images['representation'] == 'h264':
+            blocks.append(lfp.chunks[block_of_images['blockOfImagesRef']].data)
+    return blocks
+
+def _copy_to_temp_dir(lfp_path):
+    temp_dir = tempfile.mkdtemp(prefix='lfp-benchmark-')
+    temp_path = os.path.join(temp_dir, os.path.basename(lfp_path))
+    shutil.copyfile(lfp_path, temp_path)
+    _TEMP_DIRS.append(temp_dir)
+    return temp_path
+
+_TEMP_DIRS = []
+
+
+################################################################
+# Benchmarks: reading
+
+@benchmark('file.load')
+def bench_file_load(lfp_path):
+    def run():
+        LfpGenericFile(lfp_path).load().close()
+    return run
+
+@benchmark('file.scan_sections')
+def bench_file_scan_sections(lfp_path):
+    def run():
+        with open(lfp_path, 'rb') as lfp_file:
+            for section in LfpStreamReader(lfp_file, verify=False):
+                section.skip()
+    return run
+
+@benchmark('file.verify_sections')
+def bench_file_verify_sections(lfp_path):
+    def run():
+        with open(lfp_path, 'rb') as lfp_file:
+            for section in LfpStreamReader(lfp_file):
+                section.skip()
+    return run
+
+@benchmark('picture.load')
+def bench_picture_load(lfp_path):
+    _load_picture(lfp_path)
+    def run():
+        LfpPictureFile(lfp_path).load().close()
+    return run
+
+@benchmark('storage.load')
+def bench_storage_load(lfp_path):
+    _load_storage(lfp_path)
+    def run():
+        lfp = LfpStorageFile(lfp_path).load()
+        len(lfp.files)
+        lfp.close()
+    return run
+
+@benchmark('storage.find_files')
+def bench_storage_find_files(lfp_path):
+    lfp = _load_storage(lfp_path)
+    paths = list(lfp.files)
+    if not paths:
+        raise SkipBenchmark("No embedded files")
+    pattern = paths[len(paths) // 2][:-1] + '*'
+    def run():
+        list(lfp.find_files(pattern))
+    return run
+
+@benchmark('picture.depth_lut_decode')
+def bench_picture_depth_lut_decode(lfp_path):
+    lfp = LfpGenericFile(lfp_path).load()
+    for accel_data in lfp.meta.content.get('picture', {}).get('accelerationArray', []):
+        depth_lut = accel_data['vendorContent'].get('depthLut')
+        if depth_lut:
+            break
+    else:
+        raise SkipBenchmark("No depth look-up table")
+    depth_data = lfp.chunks[depth_lut['imageRef']].data
+    def run():
+        lfp_picture.read_depth_table(depth_data, depth_lut['width'], depth_lut['height'])
+    return run
+
+
+################################################################
+# Benchmarks: decoding
+
+@benchmark('h264.get_images')
+def bench_h264_get_images(lfp_path):
+    blocks = _h264_blocks(lfp_path)
+    if not blocks:
+        raise SkipBenchmark("No H.264 block of images")
+    if _utils.gst_h264_splitter is None:
+        raise SkipBenchmark("Cannot find GStreamer Python library")
+    def run():
+        for block in blocks:
+            _utils.gst_h264_splitter.H246Splitter(block).get_images()
+    return run
+
+@benchmark('picture.lambda_map')
+def bench_picture_lambda_map(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    rstk = lfp.get_refocus_stack()
+    depth_data = rstk.depth_lut.chunk.data
+    def run():
+        lfp_depth.upsample_depth(depth_data, rstk.depth_lut.width, rstk.depth_lut.height,
+                (rstk.width, rstk.height), lfp.LAMBDA_EDGE_THRESHOLD)
+    return run
+
+@benchmark('picture.refocus_interpolated')
+def bench_picture_refocus_interpolated(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    size = (540, 540)
+    lambdas = [ lfp.get_min_lambda() + (lfp.get_max_lambda() - lfp.get_min_lambda()) * i / 20
+            for i in range(21) ]
+    # Decode and resize refocus images beforehand, as while viewing
+    for lambda_ in lambdas:
+        lfp.render_refocus_interpolated(lambda_, size)
+    def run():
+        lfp.clear_caches()
+        for lambda_ in lambdas:
+            lfp.render_refocus_interpolated(lambda_, size)
+    return run
+
+@benchmark('picture.refocus_interpolated_frame')
+def bench_picture_refocus_interpolated_frame(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    # One uncached frame at full size, blended from two decoded images
+    lambdas = sorted(rimg.lambda_ for rimg in lfp.get_refocus_stack().refocus_images.values())
+    if len(lambdas) < 2:
+        raise SkipBenchmark("Single refocus image")
+    lambda_ = (lambdas[0] + lambdas[1]) / 2
+    lfp.render_refocus_interpolated(lambda_)
+    def run():
+        lfp.clear_caches()
+        lfp.render_refocus_interpolated(lambda_)
+    return run
+
+@benchmark('picture.parallax_interpolated')
+def bench_picture_parallax_interpolated(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    if not lfp.has_parallax_stack():
+        raise SkipBenchmark("No parallax stack")
+    size = (540, 540)
+    viewpoints = [ (i / 20, .5 + .2 * math.sin(i)) for i in range(21) ]
+    # Decode and resize parallax images beforehand, as while viewing
+    for x_f, y_f in viewpoints:
+        lfp.render_parallax_interpolated(x_f, y_f, size)
+    def run():
+        lfp.clear_caches()
+        for x_f, y_f in viewpoints:
+            lfp.render_parallax_interpolated(x_f, y_f, size)
+    return run
+
+@benchmark('picture.thumbnail')
+def bench_picture_thumbnail(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    if not lfp.has_refocus_stack() and not lfp.has_parallax_stack():
+        raise SkipBenchmark("No refocus or parallax stack")
+    lfp.get_pil_thumbnail((256, 256))
+    def run():
+        lfp.get_pil_thumbnail((256, 256))
+    return run
+
+@benchmark('picture.get_pil_image')
+def bench_picture_get_pil_image(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    if lfp.has_refocus_stack():
+        group, image_ids = 'refocus', lfp.get_refocus_stack().refocus_images
+    elif lfp.has_parallax_stack():
+        group, image_ids = 'parallax', lfp.get_parallax_stack().parallax_images
+    else:
+        raise SkipBenchmark("No refocus or parallax stack")
+    def run():
+        for image_id in image_ids:
+            lfp.get_pil_image(group, image_id).load()
+    return run
+
+@benchmark('picture.all_focused')
+def bench_picture_all_focused(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    for image_id in lfp.get_refocus_stack().refocus_images:
+        lfp.get_pil_image('refocus', image_id).load()
+    def run():
+        lfp.clear_caches()
+        lfp.render_all_focused()
+    return run
+
+@benchmark('picture.all_focused_preview')
+def bench_picture_all_focused_preview(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    def run():
+        lfp.clear_caches(resized=True)
+        lfp.render_all_focused((200, 200))
+    return run
+
+
+################################################################
+# Benchmarks: serving
+
+@benchmark('server.refocus')
+def bench_server_refocus(lfp_path):
+    _require_pil()
+    _require_refocus_stack(_load_picture(lfp_path))
+    server = lfp_server.LfpHttpServer([lfp_path], ('127.0.0.1', 0), threads=1)
+    server.server_close()
+    path = '/pictures/%s/refocus' % os.path.splitext(os.path.basename(lfp_path))[0]
+    queries = [ dict(size=['256'], **{'lambda': [str(i)]}) for i in range(-2, 3) ]
+    try:
+        server.get_response(path, queries[0])
+    except lfp_server.LfpServerError as err:
+        # Missing GStreamer, for H.264-encoded stacks
+        raise SkipBenchmark(str(err))
+    def run():
+        server._responses.clear()
+        for query in queries:
+            server.get_response(path, query)
+    return run
+
+
+################################################################
+# Benchmarks: lookups
+
+LOOKUP_GRID = 32
+
+def _lookup_coords():
+    return [ ((i + .5) / LOOKUP_GRID, (j + .5) / LOOKUP_GRID)
+            for i in range(LOOKUP_GRID) for j in range(LOOKUP_GRID) ]
+
+@benchmark('picture.closest_refocus')
+def bench_picture_closest_refocus(lfp_path):
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    coords = _lookup_coords()
+    def run():
+        for x_f, y_f in coords:
+            lfp.find_closest_refocus_image(x_f, y_f)
+    return run
+
+@benchmark('picture.closest_refocus_by_lambda')
+def bench_picture_closest_refocus_by_lambda(lfp_path):
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    min_lambda, max_lambda = lfp.get_min_lambda(), lfp.get_max_lambda()
+    lambdas = [ min_lambda + (max_lambda - min_lambda) * k / 1023 for k in range(1024) ]
+    def run():
+        for lambda_ in lambdas:
+            lfp.find_closest_refocus_image_by_lambda(lambda_)
+    return run
+
+@benchmark('picture.closest_parallax')
+def bench_picture_closest_parallax(lfp_path):
+    lfp = _load_picture(lfp_path)
+    _require_parallax_stack(lfp)
+    coords = _lookup_coords()
+    def run():
+        for x_f, y_f in coords:
+            lfp.find_closest_parallax_image(x_f, y_f)
+    return run
+
+
+################################################################
+# Benchmarks: exporting
+
+@benchmark('export.file')
+def bench_export_file(lfp_path):
+    lfp = LfpGenericFile(_copy_to_temp_dir(lfp_path)).load()
+    def run():
+        lfp.export()
+    return run
+
+@benchmark('export.picture')
+def bench_export_picture(lfp_path):
+    _require_pil()
+    lfp = _load_picture(_copy_to_temp_dir(lfp_path))
+    def run():
+        lfp.export()
+    return run
+
+@benchmark('export.archive_tar')
+def bench_export_archive_tar(lfp_path):
+    temp_path = _copy_to_temp_dir(lfp_path)
+    lfp = LfpGenericFile(temp_path).load()
+    def run():
+        with LfpArchiveWriter(temp_path + '.tar') as archive:
+            lfp.export_to_archive(archive)
+    return run
+
+@benchmark('export.chunk_store')
+def bench_export_chunk_store(lfp_path):
+    temp_path = _copy_to_temp_dir(lfp_path)
+    lfp = LfpGenericFile(temp_path).load()
+    store = LfpChunkStore(tempfile.mkdtemp(dir=os.path.dirname(temp_path)))
+    def run():
+        lfp.export_chunks_to_store(store)
+    return run
+
+
+################################################################
+# Results
+
+def _get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                cwd=TEST_DIR, stderr=subprocess.STDOUT).decode('ASCII').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.contextmanager
+def benchmark_paths(lfp_paths, synthetic=()):
+    """Return a context manager of the LFP files to run on
+
+    Sample files are used by default, and synthetic files of the given
+    presets are written to a temporary directory, removed on exit.
+    """
+    if not lfp_paths and not synthetic:
+        lfp_paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, '*.lfp')))
+    synthetic_dir = None
+    try:
+        if synthetic:
+            synthetic_dir = tempfile.mkdtemp(prefix='lfp-synthetic-')
+            lfp_paths = list(lfp_paths) + lfp_synth.write_preset_files(synthetic_dir, synthetic)
+        yield lfp_paths
+    finally:
+        if synthetic_dir:
+            shutil.rmtree(synthetic_dir, ignore_errors=True)
+
+
+def save_results(results, output=None):
+    """Return the report of results, written as JSON to `output' if given"""
+    report = dict(
+            version=RESULTS_VERSION,
+            commit=_get_commit(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'),
+            results=results)
+    if output:
+        with open(output, 'w') as output_file:
+            json.dump(report, output_file, indent=4, sort_keys=True)
+    return report
+
+
+def load_results(results_path):
+    """Return the results of a JSON results file"""
+    with open(results_path) as results_file:
+        return json.load(results_file)['results']
+
+
+def compare_results(old_results, new_results, threshold, metric, format_value,
+        key_width=60, improved_mark='faster', quiet=False):
+    """Print a metric of two JSON results files, return the number of
+    regressions
+    """
+    old = load_results(old_results)
+    new = load_results(new_results)
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        if old[key].get(metric) is None or new[key].get(metric) is None:
+            continue
+        ratio = new[key][metric] / old[key][metric] if old[key][metric] else 1.
+        mark = ''
+        if ratio > threshold:
+            mark = 'REGRESSION'
+            regressions += 1
+        elif ratio < 1 / threshold:
+            mark = improved_mark
+        if not quiet:
+            print("%-*s %s %s %7.2fx  %s" % (key_width, key,
+                format_value(old[key][metric]), format_value(new[key][metric]), ratio, mark))
+    return regressions
+
+
+def make_arg_parser(description, run, compare, item_name):
+    """Return the argument parser, and its `run' and `compare' subcommand
+    parsers, of a benchmark script
+    """
+    debug_kwargs = dict(
+            action='store_true',
+            help="Print debugging information on error",
+            )
+    quiet_kwargs = dict(
+            action='store_true',
+            help="Do not write anything to standard output",
+            )
+
+    # Main command
+    p_main = argparse.ArgumentParser(description=description)
+    p_subs = p_main.add_subparsers(title='subcommands')
+
+    # Run command
+    p_run = p_subs.add_parser('run', help=run.__doc__)
+    p_run.set_defaults(subcmd=run)
+    p_run.add_argument('-d', '--debug', **debug_kwargs)
+    p_run.add_argument('-q', '--quiet', **quiet_kwargs)
+    p_run.add_argument('-o', '--output', metavar='results.json',
+            help="Write results as JSON")
+    p_run.add_argument('-k', '--filter', dest='filters', action='append', default=[],
+            help="Only run %s whose 'name@file' contains this string" % item_name)
+    p_run.add_argument('-s', '--synthetic', action='append', default=[],
+            choices=sorted(lfp_synth.PRESETS),
+            help="Also run on a synthetic file of this preset, written to a temporary directory")
+    p_run.add_argument('lfp_paths', nargs='*', metavar='file.lfp',
+            help="LFP files (default: all sample files)")
+
+    # Compare command
+    p_compare = p_subs.add_parser('compare', help=compare.__doc__)
+    p_compare.set_defaults(subcmd=compare)
+    p_compare.add_argument('-d', '--debug', **debug_kwargs)
+    p_compare.add_argument('-q', '--quiet', **quiet_kwargs)
+    p_compare.add_argument('-t', '--threshold', type=float, default=1.1,
+            help="Ratio reported as regression (default: 1.1)")
+    p_compare.add_argument('old_results', metavar='old.json')
+    p_compare.add_argument('new_results', metavar='new.json')
+
+    return p_main, p_run, p_compare
+
+
+################################################################
+# Running
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid-1] + values[mid]) / 2
+
+
+def run_benchmark(func, lfp_path, repeat):
+    """Time a benchmark, return its result dict"""
+    times = []
+    for idx in range(repeat):
+        run = func(lfp_path)
+        start = timer()
+        run()
+        times.append(timer() - start)
+    return dict(min=min(times), median=_median(times),
+            mean=sum(times) / len(times), repeat=repeat)
+
+
+def run(lfp_paths, output=None, repeat=5, filters=(), synthetic=(), **null):
+    """Run benchmarks on LFP files and write results as JSON
+    """
+    results = {}
+    try:
+        with benchmark_paths(lfp_paths, synthetic) as lfp_paths:
+            for lfp_path in lfp_paths:
+                for name, func in BENCHMARKS:
+                    key = "%s@%s" % (name, os.path.basename(lfp_path))
+                    if filters and not any(f in key for f in filters):
+                        continue
+                    try:
+                        results[key] = run_benchmark(func, lfp_path, repeat)
+                    except (SkipBenchmark, RuntimeError) as err:
+                        # RuntimeError for missing GStreamer or PIL, on first decoding
+                        results[key] = dict(skipped=str(err))
+                    if not QUIET:
+                        if 'skipped' in results[key]:
+                            print("%-60s %12s  (%s)" % (key, "skipped", results[key]['skipped']))
+                        else:
+                            print("%-60s %10.2fms" % (key, results[key]['median'] * 1000))
+                    while _TEMP_DIRS:
+                        shutil.rmtree(_TEMP_DIRS.pop(), ignore_errors=True)
+    finally:
+        while _TEMP_DIRS:
+            shutil.rmtree(_TEMP_DIRS.pop(), ignore_errors=True)
+    return save_results(results, output)
+
+
+def compare(old_results, new_results, threshold=1.1, metric='median', **null):
+    """Compare two JSON results files, failing on regressions
+    """
+    regressions = compare_results(old_results, new_results, threshold, metric,
+            lambda value: "%10.2fms" % (value * 1000), quiet=QUIET)
+    if regressions:
+        raise Exception("%d benchmark(s) slower than %.2fx" % (regressions, threshold))
+
+
+def main(argv=sys.argv[1:]):
+    """Parse command-line arguments and call commands
+    """
+    global DEBUG, QUIET
+
+    p_main, p_run, p_compare = make_arg_parser(__doc__, run, compare, 'benchmarks')
+    p_run.add_argument('-r', '--repeat', type=int, default=5,
+            help="Number of timed runs of each benchmark (default: 5)")
+    p_compare.add_argument('-m', '--metric', choices=('min', 'median', 'mean'), default='median',
+            help="Timing compared (default: median)")
+
+    args = p_main.parse_args(argv)
+
+    # Run subcommand
+    DEBUG = args.debug
+    QUIET = args.quiet
+    args.subcmd(**dict(args._get_kwargs()))
+
+
+if __name__=='__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(3)
+    except Exception as err:
+        if DEBUG:
+            raise
+        else:
+            if not QUIET:
+                print("%s: error: %s" % (os.path.basename(sys.argv[0]), err), file=sys.stderr)
+            sys.exit(9)
@@ -0,0 +1,55 @@
+#!/bin/bash
+set -e
+cd `dirname $0`
+
+SCRIPT_DIR=".."
+SAMPLE_DIR="../samples"
+SCRIPT_CMD="lfp-catalog.py"
+: ${PYTHON_CMD:="/usr/bin/env python"}
+
+
+function _test {
+	subcmd=$1
+	shift 1
+	params=$@
+	echo
+	echo "################################"
+	echo "# $SCRIPT_CMD $subcmd"
+	echo
+	$PYTHON_CMD $SCRIPT_DIR/$SCRIPT_CMD $subcmd -d $params
+	echo
+}
+
+
+_test 'index' \
+	$SAMPLE_DIR/catalog.db	\
+	$SAMPLE_DIR
+
+_test 'query' \
+	--stack refocus	\
+	$SAMPLE_DIR/catalog.db
+
+_test 'query' \
+	--field 'picture.accelerationArray.0.type=*depthMap' \
+	$SAMPLE_DIR/catalog.db
+
+# A file with corrupted metadata is indexed with an error, not aborting
+CORRUPT_DIR=`mktemp -d`
+trap "rm -rf $CORRUPT_DIR" EXIT
+cp $SAMPLE_DIR/IMG_0001-stk.lfp $CORRUPT_DIR/
+$PYTHON_CMD lfp_synth.py -q --corrupt-meta --refocus-images 2 --image-size 64 \
+	$CORRUPT_DIR/corrupt_meta.lfp
+
+_test 'index' \
+	$CORRUPT_DIR/catalog.db	\
+	$CORRUPT_DIR
+
+_test 'index' \
+	-j 1	\
+	$CORRUPT_DIR/catalog_j1.db	\
+	$CORRUPT_DIR
+
+for catalog in catalog.db catalog_j1.db; do
+	$PYTHON_CMD $SCRIPT_DIR/$SCRIPT_CMD query -d $CORRUPT_DIR/$catalog | grep -q corrupt_meta.lfp
+	$PYTHON_CMD $SCRIPT_DIR/$SCRIPT_CMD query -d -t picture $CORRUPT_DIR/$catalog | grep -q IMG_0001-stk.lfp
+done
@@ -35,6 +35,18 @@ _test 'export' \
 	$SAMPLE_DIR/IMG_0002-stk.lfp	\
 	$SAMPLE_DIR/IMG_0002-dm.lfp
 
+_test 'export' \
+	--store $SAMPLE_DIR/store --link	\
+	$SAMPLE_DIR/IMG_0001-stk.lfp	\
+	$SAMPLE_DIR/IMG_0002-stk.lfp
+
 _test 'extract' \
 	$SAMPLE_DIR/IMG_0001.lfp sha1-992ae2d9f755077e50de7b9b1357e873885b3382
 
+_test 'repack' \
+	--drop-frame	\
+	$SAMPLE_DIR/IMG_0001.lfp
+
+_test 'verify' \
+	$SAMPLE_DIR/IMG_0001-stk.lfp	\
+	$SAMPLE_DIR/IMG_0002-stk.lfp
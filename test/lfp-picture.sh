@@ -35,3 +35,48 @@ _test 'export' \
 	$SAMPLE_DIR/IMG_0002-stk.lfp	\
 	$SAMPLE_DIR/IMG_0002-dm.lfp
 
+_test 'export' \
+	--archive $SAMPLE_DIR/export.tar	\
+	$SAMPLE_DIR/IMG_0001-stk.lfp	\
+	$SAMPLE_DIR/IMG_0002-stk.lfp
+
+_test 'export' \
+	--profile --trace $SAMPLE_DIR/trace.json --metrics	\
+	$SAMPLE_DIR/IMG_0001-stk.lfp
+
+_test 'export' \
+	--depth-format txt --depth-format npy --depth-format pfm --depth-format png	\
+	$SAMPLE_DIR/IMG_0001-stk.lfp
+
+_test 'thumbnails' \
+	--size 128 --jobs 2	\
+	$SAMPLE_DIR/IMG_0001-stk.lfp	\
+	$SAMPLE_DIR/IMG_0002-stk.lfp
+
+_test 'thumbnails' \
+	--contact-sheet $SAMPLE_DIR/contact_sheet --columns 4 --rows 2	\
+	$SAMPLE_DIR
+
+_test 'animate' \
+	--size 256 --bounce	\
+	$SAMPLE_DIR/IMG_0001-stk.lfp
+
+_test 'animate' \
+	--mode parallax_orbit	\
+	$SAMPLE_DIR/IMG_0002-stk.lfp
+
+# Commands with --metrics run locally, not in a daemon with warm pictures
+export LFP_DAEMON_SOCKET=`mktemp -u`
+$PYTHON_CMD $SCRIPT_DIR/$SCRIPT_CMD daemon -q &
+DAEMON_PID=$!
+trap "kill $DAEMON_PID" EXIT
+for i in `seq 50`; do
+	[ -S $LFP_DAEMON_SOCKET ] && break
+	sleep 0.1
+done
+
+_test 'info' \
+	$SAMPLE_DIR/IMG_0001-stk.lfp
+
+$PYTHON_CMD $SCRIPT_DIR/$SCRIPT_CMD info --metrics $SAMPLE_DIR/IMG_0001-stk.lfp 2>&1 >/dev/null	\
+	| grep -q '^reads: *[1-9]'
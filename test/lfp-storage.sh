@@ -27,6 +27,10 @@ _test 'info' \
 _test 'export' \
 	$SAMPLE_DIR/data_0001.lfp
 
+_test 'export' \
+	--pattern "C:\\CALIB\\*" \
+	$SAMPLE_DIR/data_0001.lfp
+
 _test 'extract' \
 	$SAMPLE_DIR/data_0001.lfp "C:\\CALIB\\ACC.TXT"
 
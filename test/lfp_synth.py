@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Generate synthetic LFP files for scale testing
+
+Picture files get a JPEG-based refocus stack (requires PIL), a raw depth
+look-up table, an optional raw frame and extra data chunks.  Storage files
+get embedded files.  All SHA1 ids are valid, and large payloads are streamed
+with constant memory.
+"""
+
+
+from __future__ import division, print_function
+
+import os, os.path
+import sys
+import json
+import math
+import struct
+import hashlib
+import argparse
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TEST_DIR))
+
+from lfp_reader import LfpWriter, lfp_logging
+from lfp_reader.lfp_section import LfpChunk
+from lfp_reader._utils import BytesIO, pil
+
+
+DEBUG = False
+QUIET = False
+
+BLOCK_SIZE = 64 * 1024
+
+# Named configurations, for benchmarks and stress tests
+PRESETS = {
+        'chunks-10k':  dict(kind='picture', chunks=10000, chunk_size=256),
+        'storage-10k': dict(kind='storage', storage_files=10000, chunk_size=256),
+        'refocus-64':  dict(kind='picture', refocus_images=64, lut_size=330),
+        'raw-100mb':   dict(kind='picture', raw_frame_size=100 * 2**20),
+        }
+
+
+################################################################
+# Payloads
+
+class _Payload:
+    """Deterministic data, generated block by block"""
+
+    def __init__(self, seed, size):
+        self._seed = seed
+        self.size = size
+        self._sha1 = None
+
+    def iter_blocks(self):
+        pos, idx = 0, 0
+        while pos < self.size:
+            digest = hashlib.sha1(("%s:%d" % (self._seed, idx)).encode('ASCII')).digest()
+            block_size = min(BLOCK_SIZE, self.size - pos)
+            yield (digest * (block_size // len(digest) + 1))[:block_size]
+            pos += block_size
+            idx += 1
+
+    @property
+    def sha1(self):
+        if self._sha1 is None:
+            sha1_hash = hashlib.sha1()
+            for block in self.iter_blocks():
+                sha1_hash.update(block)
+            self._sha1 = "sha1-" + sha1_hash.hexdigest()
+        return self._sha1
+
+
+class _BytesPayload:
+    """Data kept in memory"""
+
+    def __init__(self, data):
+        self._data = data
+        self.size = len(data)
+        self.sha1 = "sha1-" + hashlib.sha1(data).hexdigest()
+
+    def iter_blocks(self):
+        yield self._data
+
+
+def _gen_jpeg(idx, count, image_size):
+    if pil is None:
+        raise RuntimeError("Cannot find Python Imaging Library (PIL or Pillow)")
+    level = int(255 * idx / max(count - 1, 1))
+    noise = pil.effect_noise((image_size, image_size), 32)
+    image = pil.merge('RGB', (noise, noise.point(lambda v: (v + level) % 256), noise))
+    output = BytesIO()
+    image.save(output, 'jpeg', quality=85)
+    return output.getvalue()
+
+
+def _gen_depth_lut(lut_size, min_lambda, max_lambda):
+    values = [ min_lambda + (max_lambda - min_lambda)
+            * (0.5 + 0.5 * math.sin(6.0 * i / lut_size) * math.cos(4.0 * j / lut_size))
+            for j in range(lut_size) for i in range(lut_size) ]
+    return struct.pack("<%df" % len(values), *values)
+
+
+################################################################
+# Files
+
+def write_synthetic_picture(lfp_path, chunks=0, chunk_size=1024,
+        refocus_images=12, image_size=1080, lut_size=20, raw_frame_size=0,
+        corrupt_meta=False):
+    """Write a synthetic LFP Picture file, with truncated metadata JSON if
+    `corrupt_meta'
+    """
+    min_lambda, max_lambda = -10., 10.
+    payloads = []
+    picture = dict(frameArray=[], viewArray=[], accelerationArray=[], derivationArray=[])
+
+    # Processed files refer to the frame without carrying it
+    frame = {}
+    for ref, payload in (
+            ('metadataRef',        _BytesPayload(b'{"camera" : {"make" : "Synthetic", "model" : "S01"}}')),
+            ('imageRef',           _Payload('frame', raw_frame_size)),
+            ('privateMetadataRef', _BytesPayload(b'{"camera" : {"serialNumber" : "0000000000"}}'))):
+        frame[ref] = payload.sha1
+        if raw_frame_size:
+            payloads.append(payload)
+    picture['frameArray'].append(dict(frame=frame))
+
+    if refocus_images:
+        image_array = []
+        for idx in range(refocus_images):
+            payload = _BytesPayload(_gen_jpeg(idx, refocus_images, image_size))
+            payloads.append(payload)
+            image_array.append(dict(
+                imageRef=payload.sha1,
+                representation='jpeg',
+                width=image_size,
+                height=image_size,
+                **{'lambda': min_lambda + (max_lambda - min_lambda) * idx / max(refocus_images - 1, 1)}))
+        depth_payload = _BytesPayload(_gen_depth_lut(lut_size, min_lambda, max_lambda))
+        payloads.append(depth_payload)
+        picture['accelerationArray'].append(dict(
+            type='com.lytro.acceleration.refocusStack',
+            generator='lfp_synth',
+            vendorContent=dict(
+                displayParameters=dict(displayDimensions=dict(
+                    mode='fixedToValue',
+                    value=dict(width=image_size, height=image_size))),
+                defaultLambda=0,
+                depthLut=dict(
+                    width=lut_size,
+                    height=lut_size,
+                    representation='raw',
+                    imageRef=depth_payload.sha1),
+                imageArray=image_array)))
+
+    for idx in range(chunks):
+        payload = _Payload('chunk-%d' % idx, chunk_size)
+        payloads.append(payload)
+        picture['derivationArray'].append(payload.sha1)
+
+    meta = dict(picture=picture, thumbnailArray=[],
+            version=dict(major=1, minor=0, provisionalDate='2011-08-03'))
+    if corrupt_meta:
+        meta = json.dumps(meta, indent=4, sort_keys=True).encode('ASCII')[:-2]
+    _write_file(lfp_path, meta, payloads)
+
+
+def write_synthetic_storage(lfp_path, storage_files=100, chunk_size=1024):
+    """Write a synthetic LFP Storage file"""
+    payloads = []
+    files = []
+    for idx in range(storage_files):
+        payload = _Payload('file-%d' % idx, chunk_size)
+        payloads.append(payload)
+        files.append(dict(name='C:\\SYNTH\\%03d\\%05d.BIN' % (idx // 100, idx), dataRef=payload.sha1))
+    meta = dict(files=files,
+            version=dict(major=1, minor=0, provisionalDate='2011-08-03'))
+    _write_file(lfp_path, meta, payloads)
+
+
+def _write_file(lfp_path, meta, payloads):
+    with LfpWriter(lfp_path) as writer:
+        writer.write_header()
+        writer.write_meta(meta)
+        for payload in payloads:
+            writer.write_section(LfpChunk, payload.iter_blocks(), payload.size, payload.sha1)
+    lfp_logging.log("Create file: %s" % lfp_path)
+
+
+def write_synthetic_file(lfp_path, kind='picture', **kwargs):
+    """Write a synthetic LFP file of a given kind ('picture' or 'storage')"""
+    if kind == 'picture':
+        write_synthetic_picture(lfp_path, **kwargs)
+    elif kind == 'storage':
+        write_synthetic_storage(lfp_path, **kwargs)
+    else:
+        raise ValueError("Unknown kind of LFP file: %s" % kind)
+
+
+def write_preset_files(output_dir, presets=None):
+    """Write synthetic files of named presets, return their paths"""
+    lfp_paths = []
+    for name in sorted(presets or PRESETS):
+        lfp_path = os.path.join(output_dir, 'synthetic-%s.lfp' % name)
+        write_synthetic_file(lfp_path, **PRESETS[name])
+        lfp_paths.append(lfp_path)
+    return lfp_paths
+
+
+################################################################
+# Command line
+
+def main(argv=sys.argv[1:]):
+    """Parse command-line arguments and write files
+    """
+    global DEBUG, QUIET
+
+    p_main = argparse.ArgumentParser(description=__doc__)
+    p_main.add_argument('-d', '--debug', action='store_true',
+            help="Print debugging information on error")
+    p_main.add_argument('-q', '--quiet', action='store_true',
+            help="Do not write anything to standard output")
+    p_main.add_argument('-p', '--preset', choices=sorted(PRESETS),
+            help="Use a named configuration")
+    p_main.add_argument('-k', '--kind', choices=('picture', 'storage'), default='picture',
+            help="Kind of LFP file (default: picture)")
+    p_main.add_argument('--chunks', type=int, default=0,
+            help="Number of extra data chunks in picture files")
+    p_main.add_argument('--chunk-size', type=int, default=1024,
+            help="Size of extra data chunks and embedded files, in bytes")
+    p_main.add_argument('--storage-files', type=int, default=100,
+            help="Number of embedded files in storage files")
+    p_main.add_argument('--refocus-images', type=int, default=12,
+            help="Number of refocus images in picture files")
+    p_main.add_argument('--image-size', type=int, default=1080,
+            help="Width and height of refocus images")
+    p_main.add_argument('--lut-size', type=int, default=20,
+            help="Width and height of the depth look-up table")
+    p_main.add_argument('--raw-frame-size', type=int, default=0,
+            help="Size of the raw frame image in picture files, in bytes")
+    p_main.add_argument('--corrupt-meta', action='store_true',
+            help="Truncate the metadata JSON of picture files")
+    p_main.add_argument('lfp_path', metavar='output.lfp')
+    args = p_main.parse_args(argv)
+
+    DEBUG = args.debug
+    QUIET = args.quiet
+    if not QUIET:
+        lfp_logging.set_log_stream(sys.stdout)
+
+    if args.preset:
+        write_synthetic_file(args.lfp_path, **PRESETS[args.preset])
+    elif args.kind == 'storage':
+        write_synthetic_storage(args.lfp_path,
+                storage_files=args.storage_files, chunk_size=args.chunk_size)
+    else:
+        write_synthetic_picture(args.lfp_path,
+                chunks=args.chunks, chunk_size=args.chunk_size,
+                refocus_images=args.refocus_images, image_size=args.image_size,
+                lut_size=args.lut_size, raw_frame_size=args.raw_frame_size,
+                corrupt_meta=args.corrupt_meta)
+
+
+if __name__=='__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(3)
+    except Exception as err:
+        if DEBUG:
+            raise
+        else:
+            if not QUIET:
+                print("%s: error: %s" % (os.path.basename(sys.argv[0]), err), file=sys.stderr)
+            sys.exit(9)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+#
+# lfp-reader
+# LFP (Light Field Photography) File Reader.
+#
+# http://code.behnam.es/python-lfp-reader/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright (C) 2012-2013  Behnam Esfahbod
+
+
+"""Measure the memory used by each stage of the LFP Picture pipeline
+
+Each stage runs on a fresh LFP Picture file, in a separate process, and
+reports the peak and retained Python memory (tracemalloc), what is still
+traced once the file is closed (leaks, and one-time caches of imported
+modules), the memory kept by cached PIL images and the growth of the process
+peak RSS.  PIL image buffers are not traced by tracemalloc, so they only show
+in the last two.  Results are written as JSON to be compared across commits.
+Requires Python 3.4+.
+"""
+
+
+from __future__ import division, print_function
+
+import os, os.path
+import sys
+import gc
+import shutil
+import tempfile
+import multiprocessing
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TEST_DIR))
+
+from lfp_reader import lfp_animation
+from benchmark import (SkipBenchmark, benchmark_paths, save_results, compare_results,
+        make_arg_parser, _load_picture, _require_pil, _require_refocus_stack)
+
+
+DEBUG = False
+QUIET = False
+
+METRICS = ('peak', 'retained', 'leaked', 'pil_images', 'rss_peak')
+
+
+################################################################
+# Registry
+
+STAGES = []
+
+def stage(name):
+    """Register a pipeline stage
+
+    The decorated function gets an LFP file path, runs the stage on a fresh
+    LFP Picture file and returns the objects to be kept alive.
+    """
+    def decorator(func):
+        STAGES.append((name, func))
+        return func
+    return decorator
+
+
+def _require_stack(lfp):
+    if not lfp.has_refocus_stack() and not lfp.has_parallax_stack():
+        raise SkipBenchmark("No refocus or parallax stack")
+
+_TEMP_DIRS = []
+
+
+################################################################
+# Stages
+
+@stage('load')
+def stage_load(lfp_path):
+    return _load_picture(lfp_path)
+
+@stage('decode')
+def stage_decode(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_stack(lfp)
+    if lfp.has_refocus_stack():
+        for id in lfp.get_refocus_stack().refocus_images:
+            lfp.get_pil_image('refocus', id)
+    if lfp.has_parallax_stack():
+        for id in lfp.get_parallax_stack().parallax_images:
+            lfp.get_pil_image('parallax', id)
+    return lfp
+
+@stage('all_focused')
+def stage_all_focused(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    lfp.get_pil_image('all_focused')
+    return lfp
+
+@stage('preload')
+def stage_preload(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_stack(lfp)
+    lfp.preload_pil_images()
+    return lfp
+
+@stage('focus_sweep')
+def stage_focus_sweep(lfp_path):
+    _require_pil()
+    lfp = _load_picture(lfp_path)
+    _require_refocus_stack(lfp)
+    with open(os.devnull, 'wb') as output:
+        lfp_animation.write_gif(output, lfp_animation.iter_frames(
+            lfp, 'refocus', lfp_animation.get_focus_sweep_ids(lfp, bounce=True)))
+    return lfp
+
+@stage('export')
+def stage_export(lfp_path):
+    _require_pil()
+    temp_dir = tempfile.mkdtemp(prefix='lfp-memory-')
+    _TEMP_DIRS.append(temp_dir)
+    temp_path = os.path.join(temp_dir, os.path.basename(lfp_path))
+    shutil.copyfile(lfp_path, temp_path)
+    lfp = _load_picture(temp_path)
+    lfp.export()
+    return lfp
+
+
+################################################################
+# Measuring
+
+def _get_peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on Mac OS X
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _measure_stage(name, lfp_path):
+    import tracemalloc
+    func = dict(STAGES)[name]
+    gc.collect()
+    rss_before = _get_peak_rss()
+    tracemalloc.start()
+    try:
+        lfp = func(lfp_path)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        pil_images = lfp.get_cached_images_size()
+        lfp.close()
+        del lfp
+        gc.collect()
+        leaked = tracemalloc.get_traced_memory()[0]
+    except (SkipBenchmark, RuntimeError) as err:
+        # RuntimeError for missing GStreamer or PIL, on first decoding
+        return dict(skipped=str(err))
+    finally:
+        tracemalloc.stop()
+        while _TEMP_DIRS:
+            shutil.rmtree(_TEMP_DIRS.pop(), ignore_errors=True)
+    rss_after = _get_peak_rss()
+    return dict(peak=peak, retained=retained, leaked=leaked, pil_images=pil_images,
+            rss_peak=rss_after - rss_before if rss_before is not None else None)
+
+
+def measure_stage(name, lfp_path):
+    """Measure a stage in a fresh process, return its result dict"""
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        return pool.apply(_measure_stage, (name, lfp_path))
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _format_size(size):
+    if size is None:
+        return "-"
+    return "%.1fM" % (size / 2**20)
+
+
+def run(lfp_paths, output=None, filters=(), synthetic=(), **null):
+    """Measure memory of pipeline stages on LFP files and write results as JSON
+    """
+    results = {}
+    with benchmark_paths(lfp_paths, synthetic) as lfp_paths:
+        if not QUIET:
+            print("%-50s %9s %9s %9s %9s %9s" % (("Stage",) + METRICS))
+        for lfp_path in lfp_paths:
+            for name, func in STAGES:
+                key = "%s@%s" % (name, os.path.basename(lfp_path))
+                if filters and not any(f in key for f in filters):
+                    continue
+                results[key] = measure_stage(name, lfp_path)
+                if not QUIET:
+                    if 'skipped' in results[key]:
+                        print("%-50s %9s  (%s)" % (key, "skipped", results[key]['skipped']))
+                    else:
+                        print("%-50s %9s %9s %9s %9s %9s" % ((key,) + tuple(
+                            _format_size(results[key][metric]) for metric in METRICS)))
+    return save_results(results, output)
+
+
+def compare(old_results, new_results, threshold=1.1, metric='peak', **null):
+    """Compare two JSON results files, failing on memory regressions
+    """
+    regressions = compare_results(old_results, new_results, threshold, metric,
+            lambda value: "%9s" % _format_size(value), key_width=50,
+            improved_mark='smaller', quiet=QUIET)
+    if regressions:
+        raise Exception("%d stage(s) using more than %.2fx memory" % (regressions, threshold))
+
+
+def main(argv=sys.argv[1:]):
+    """Parse command-line arguments and call commands
+    """
+    global DEBUG, QUIET
+
+    p_main, p_run, p_compare = make_arg_parser(__doc__, run, compare, 'stages')
+    p_compare.add_argument('-m', '--metric', choices=METRICS, default='peak',
+            help="Memory measure compared (default: peak)")
+
+    args = p_main.parse_args(argv)
+
+    # Run subcommand
+    DEBUG = args.debug
+    QUIET = args.quiet
+    args.subcmd(**dict(args._get_kwargs()))
+
+
+if __name__=='__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(3)
+    except Exception as err:
+        if DEBUG:
+            raise
+        else:
+            if not QUIET:
+                print("%s: error: %s" % (os.path.basename(sys.argv[0]), err), file=sys.stderr)
+            sys.exit(9)